@@ -1,9 +1,18 @@
 
 # app.py
 from fastapi import FastAPI
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import duckdb, sqlite3, pandas as pd, os, json, pathlib, datetime as dt
+import base64, bisect, collections, contextlib, contextvars, math, mmap, queue, re, shutil, tempfile, threading, time, uuid, zlib
+from concurrent.futures import ThreadPoolExecutor
+from starlette.routing import Match
+import pyarrow as pa, pyarrow.csv as pacsv, pyarrow.parquet as pq
+try:
+    import orjson  # optional: JSON_PARSER=orjson
+except ImportError:
+    orjson = None
 app = FastAPI(title="data-exec")
 # ========= ENV / PATHS =========
 DATA_ROOT   = os.getenv("DATA_ROOT", r"E:\data_growth_agent")  # base folder for JSONs etc.
@@ -20,17 +29,108 @@ DUCK_MINISTRY_TABLE = os.getenv("DUCK_MINISTRY_TABLE", "contracts_raw")
 DUCK_STATE_TABLE    = os.getenv("DUCK_STATE_TABLE",    "contracts_raw")
 # Excel passthrough
 EXCEL_PATH = os.getenv("EXCEL_PATH", os.path.join(DATA_ROOT, "docs", "gem_categories.xlsx"))
+EXCEL_CACHE_DIR = os.getenv("EXCEL_CACHE_DIR", os.path.join(DATA_ROOT, "cache", "excel"))  # one Parquet per sheet
 # Optional BM25 indexes
 BM25_DB = {
     "text":  os.path.join(DATA_ROOT, "indices", "text_bm25.sqlite"),
     "ppt":   os.path.join(DATA_ROOT, "indices", "ppt_bm25.sqlite"),
     "media": os.path.join(DATA_ROOT, "indices", "media_bm25.sqlite"),
 }
+# Written by startup.py (the BM25 index sync the Procfile runs beside the web process); a failed
+# sync makes /ready fail. Relative, like startup.py's own paths: both run from the app folder
+INDEX_SYNC_STATUS = os.getenv("INDEX_SYNC_STATUS", os.path.join("indices", "sync_status.json"))
+# Streaming exports (format=arrow|parquet|ndjson|csv): rows per record batch
+STREAM_BATCH_ROWS = int(os.getenv("STREAM_BATCH_ROWS", "65536"))
+# Cursor pool over the in-memory DUCK: size, seconds to queue for a cursor, per-query timeout (0 = none)
+DUCK_POOL_SIZE     = int(os.getenv("DUCK_POOL_SIZE", str(os.cpu_count() or 4)))
+DUCK_POOL_WAIT     = float(os.getenv("DUCK_POOL_WAIT", "30"))
+DUCK_QUERY_TIMEOUT = float(os.getenv("DUCK_QUERY_TIMEOUT", "120"))
+# Read-only connection pools for /duck2 and /sqlite2: connections per file, idle seconds
+# before a health check and SQLite mmap size. SQLITE_IMMUTABLE lists (comma-separated) the SQLite
+# files the operator declares frozen; only those are opened immutable=1 (no locking, no WAL reads),
+# which is unsafe for files still written to, like tm_dedup.db
+NAMED_POOL_SIZE   = int(os.getenv("NAMED_POOL_SIZE", "4"))
+POOL_PING_SECS    = float(os.getenv("POOL_PING_SECS", "30"))
+SQLITE_MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)))
+SQLITE_IMMUTABLE  = {pathlib.Path(p.strip()).resolve() for p in os.getenv("SQLITE_IMMUTABLE", "").split(",")
+                     if p.strip() and p.strip() not in ("0", "1")}
+if os.getenv("SQLITE_IMMUTABLE", "").strip() == "1":
+    print("[boot] SQLITE_IMMUTABLE=1 is ignored: list the frozen SQLite files instead")
+# Products snapshot: "" keeps the live sqlite_scan view, "table" materializes into DuckDB,
+# "parquet" into PRODUCTS_SNAPSHOT_DIR; refreshed incrementally every REFRESH_SECS (0 = off)
+PRODUCTS_MATERIALIZE  = os.getenv("PRODUCTS_MATERIALIZE", "").lower()
+PRODUCTS_SNAPSHOT_DIR = os.getenv("PRODUCTS_SNAPSHOT_DIR", os.path.join(DATA_ROOT, "cache", "products_snapshot"))
+REFRESH_SECS          = float(os.getenv("REFRESH_SECS", "300"))
+# Rollup cube over contracts_all, rebuilt by the refresher when a source file changes (0 = off)
+ROLLUPS = os.getenv("ROLLUPS", "1") == "1"
+# Mount views in a background warm-up at startup instead of during import (LAZY_MOUNT=0 restores
+# import-time mounting); requests that touch DUCK wait up to MOUNT_WAIT seconds for it
+LAZY_MOUNT = os.getenv("LAZY_MOUNT", "1") == "1"
+MOUNT_WAIT = float(os.getenv("MOUNT_WAIT", "120"))
+# Server-side cursors: idle seconds before an abandoned cursor is closed, max open at once
+CURSOR_TTL = float(os.getenv("CURSOR_TTL", "300"))
+CURSOR_MAX = int(os.getenv("CURSOR_MAX", "32"))
+# Async query jobs: concurrent workers, max jobs kept (queued + finished), Parquet spool dir and
+# seconds a finished job's result is kept
+JOB_WORKERS   = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX       = int(os.getenv("JOB_MAX", "64"))
+JOB_SPOOL_DIR = os.getenv("JOB_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "dataexec-jobs"))
+JOB_TTL       = float(os.getenv("JOB_TTL", "3600"))
+# Multi-worker mode: USE_CATALOG=1 attaches CATALOG_DB (written once by build_catalog.py) read-only
+# instead of mounting every source in every worker
+USE_CATALOG = os.getenv("USE_CATALOG", "0") == "1"
+CATALOG_DB  = os.getenv("CATALOG_DB", os.path.join(DATA_ROOT, "cache", "catalog.duckdb"))
+# Hive-partitioned (year/month) Parquet copies of the contract views behind <view>_pq; exported
+# by export_partitions.py or /admin/partitions/refresh, and by the refresher if PARTITION_REFRESH=1
+PARTITION_DIR     = os.getenv("PARTITION_DIR", os.path.join(DATA_ROOT, "cache", "partitions"))
+PARTITION_REFRESH = os.getenv("PARTITION_REFRESH", "0") == "1"
+# Contract text search: SQLite FTS5 over product/service names and brands of contracts_all, refreshed
+# by the refresher when a source file changes (CONTRACT_FTS=0 disables); each build is written next to
+# CONTRACT_FTS_DB as <stem>-<ns><ext> and the older ones are removed
+CONTRACT_FTS    = os.getenv("CONTRACT_FTS", "1") == "1"
+CONTRACT_FTS_DB = os.getenv("CONTRACT_FTS_DB", os.path.join(DATA_ROOT, "indices", "contracts_fts.sqlite"))
+# /json documents: parser ("json" or "orjson" when installed) and whether orjson parses the file
+# straight from an mmap (the stdlib parser needs a bytes copy, so it always reads the file)
+JSON_PARSER = os.getenv("JSON_PARSER", "json").lower()
+JSON_MMAP   = os.getenv("JSON_MMAP", "1") == "1"
+# Result cache for /duck, /duck2, /sqlite2 and /sample (0 disables)
+RESULT_CACHE_MB = float(os.getenv("RESULT_CACHE_MB", "256"))
+# Requests slower than SLOW_QUERY_MS (0 = off) are appended to SLOW_QUERY_LOG (jsonl) with
+# their EXPLAIN ANALYZE profile, captured in the background by re-running the query
+SLOW_QUERY_MS  = float(os.getenv("SLOW_QUERY_MS", "1000"))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", os.path.join(DATA_ROOT, "logs", "slow_queries.jsonl"))
+# Resource governor. DuckDB memory budget for the process (e.g. "6GB"; "" = DuckDB's default of 80% of RAM)
+# and threads; joins, sorts and aggregates past the cap spill to DUCK_TEMP_DIR, at most DUCK_TEMP_MAX ("" = no cap).
+# Each /duck2 file is a DuckDB instance with its own cap, so they split DUCK2_MEMORY_SHARE of the budget
+# evenly and the in-memory DUCK keeps the rest
+DUCK_MEMORY_LIMIT = os.getenv("DUCK_MEMORY_LIMIT", "")
+DUCK2_MEMORY_SHARE = float(os.getenv("DUCK2_MEMORY_SHARE", "0.25"))
+DUCK_THREADS      = int(os.getenv("DUCK_THREADS", "4"))
+DUCK_TEMP_DIR     = os.getenv("DUCK_TEMP_DIR", os.path.join(tempfile.gettempdir(), "dataexec-spill"))
+DUCK_TEMP_MAX     = os.getenv("DUCK_TEMP_MAX", "")
+# Admission: requests running at once per class (interactive = JSON query endpoints, export = streamed
+# bodies; jobs are bounded by JOB_WORKERS) and seconds one may queue for a slot before a 429 (0 = no limit)
+ADMIT_INTERACTIVE = int(os.getenv("ADMIT_INTERACTIVE", str(os.cpu_count() or 4)))
+ADMIT_EXPORT      = int(os.getenv("ADMIT_EXPORT", "2"))
+ADMIT_WAIT        = float(os.getenv("ADMIT_WAIT", "10"))
+# Hard caps on JSON query results: past either, data is cut and the response carries "truncated"
+MAX_JSON_ROWS  = int(os.getenv("MAX_JSON_ROWS", "100000"))
+MAX_JSON_BYTES = int(os.getenv("MAX_JSON_BYTES", str(64 * 1024 * 1024)))
+# Named queries for /q/{name}: JSON file of read queries with typed $parameters (see QueryCatalog)
+QUERIES_FILE = os.getenv("QUERIES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "queries.json"))
+# /changes/{view}: most rows one batch may return (any format)
+CHANGES_BATCH_MAX = int(os.getenv("CHANGES_BATCH_MAX", "100000"))
 # ========= MODELS =========
-class SqlIn(BaseModel):       sql: str
-class SqlNamedIn(BaseModel):  db: str; sql: str
+class SqlIn(BaseModel):       sql: str; format: str = "json"
+class SqlNamedIn(BaseModel):  db: str; sql: str; format: str = "json"
 class ExcelIn(BaseModel):     sheet: str
-class QIn(BaseModel):         q: str; k: int = 8; index: str = "text"
+class CursorIn(BaseModel):    sql: str; n: int = 1000
+class JobIn(BaseModel):       sql: str
+class RollupIn(BaseModel):    group_by: list[str] = []; filters: dict[str, str | list[str]] = {}; month_from: str | None = None; month_to: str | None = None
+class QIn(BaseModel):         q: str; k: int = 8; index: str | list[str] = "text"
+class SuggestIn(BaseModel):   q: str; k: int = 8; index: str = "text"
+class NamedQIn(BaseModel):    params: dict = {}; format: str = "json"
+class ContractQIn(BaseModel): q: str; k: int = 20; match: str = "all"; source: str | None = None; ministry: str | None = None; state: str | None = None; date_from: str | None = None; date_to: str | None = None; min_total: float | None = None; max_total: float | None = None
 class JsonGetIn(BaseModel):   name: str; key: str | None = None
 # ========= HELPERS =========
 def _norm_path(p: str) -> str:
@@ -92,22 +192,668 @@ def _duck_attach_readonly(conn: duckdb.DuckDBPyConnection, db_path: str, alias:
 def _json_path(name: str) -> str:
     return _norm_path(os.path.join(JSON_DIR, name))
 def _register_df_as_view(df: pd.DataFrame, view: str):
-    # Best-effort unregister then register
+    # Registered DataFrames are connection-local, so copy into a real table that
+    # cursors (streaming, pools) can see too.
+    tmp = f"__df_{view}"
+    DUCK.register(tmp, df)
     try:
-        DUCK.unregister(view)
+        DUCK.execute(f"DROP VIEW IF EXISTS {view}")
+        DUCK.execute(f"CREATE OR REPLACE TABLE {view} AS SELECT * FROM {tmp}")
+    finally:
+        DUCK.unregister(tmp)
+# ========= METRICS =========
+# Per-request notes: endpoints and helpers record what they did (sql, rows, cache hit, error)
+# into a dict owned by the request; the middleware turns it into metrics once the body is sent.
+_REQ_NOTE: contextvars.ContextVar[dict | None] = contextvars.ContextVar("req_note", default=None)
+def _note(rows: int = 0, **kw):
+    note = _REQ_NOTE.get()
+    if note is not None:
+        note["rows"] = note.get("rows", 0) + rows
+        note.update(kw)
+def _fail(e: Exception) -> dict | JSONResponse:
+    _note(error=type(e).__name__)
+    if isinstance(e, Overloaded):
+        return JSONResponse({"ok": False, "error": str(e), "admission": e.stats}, status_code=429,
+                            headers={"Retry-After": str(max(1, round(ADMIT_WAIT)))})
+    return {"ok": False, "error": str(e)}
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+class Metric:
+    """Prometheus counter or histogram keyed by label values; past max_series distinct label
+    sets new ones are folded into a single "other" series to bound memory."""
+    def __init__(self, name: str, help: str, kind: str = "counter", labels: tuple = (),
+                 buckets: tuple = LATENCY_BUCKETS, max_series: int = 500):
+        self.name, self.help, self.kind, self.labels = name, help, kind, labels
+        self.buckets, self.max_series = buckets, max_series
+        self.series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+    def _slot(self, labels: dict) -> list:
+        key = tuple(str(labels.get(l, "")) for l in self.labels)
+        s = self.series.get(key)
+        if s is None:
+            if len(self.series) >= self.max_series:
+                key = ("other",) * len(self.labels)
+                s = self.series.get(key)
+            if s is None:
+                s = self.series[key] = [0.0] if self.kind == "counter" else [0] * len(self.buckets) + [0.0, 0]
+        return s
+    def inc(self, v: float = 1, **labels):
+        with self._lock:
+            self._slot(labels)[0] += v
+    def observe(self, v: float, **labels):
+        with self._lock:
+            s = self._slot(labels)
+            for i, b in enumerate(self.buckets):
+                if v <= b:
+                    s[i] += 1
+            s[-2] += v
+            s[-1] += 1
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, s in sorted(self.series.items()):
+                lbl = ",".join(f'{l}="{_prom_escape(v)}"' for l, v in zip(self.labels, key))
+                if self.kind == "counter":
+                    out.append(f"{self.name}{{{lbl}}} {s[0]:.15g}")
+                    continue
+                sep = "," if lbl else ""
+                for b, n in zip(self.buckets, s):
+                    out.append(f'{self.name}_bucket{{{lbl}{sep}le="{b:g}"}} {n}')
+                out.append(f'{self.name}_bucket{{{lbl}{sep}le="+Inf"}} {s[-1]}')
+                out.append(f"{self.name}_sum{{{lbl}}} {s[-2]:.6f}")
+                out.append(f"{self.name}_count{{{lbl}}} {s[-1]}")
+        return out
+def _prom_escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+M_REQUEST_SECONDS = Metric("dataexec_request_seconds", "Request latency including the response body.",
+                           "histogram", ("endpoint", "method", "status"))
+M_VIEW_SECONDS = Metric("dataexec_view_seconds", "Latency of requests whose SQL reads a view/table.",
+                        "histogram", ("source", "view"))
+M_ROWS = Metric("dataexec_rows_total", "Rows returned.", "counter", ("endpoint",))
+M_BYTES = Metric("dataexec_response_bytes_total", "Response bytes serialized.", "counter", ("endpoint",))
+M_CACHE = Metric("dataexec_result_cache_total", "Result cache lookups.", "counter", ("endpoint", "result"))
+M_ERRORS = Metric("dataexec_errors_total", "Failed requests (ok=false from an exception, or 5xx).",
+                  "counter", ("endpoint", "type"))
+M_SLOW = Metric("dataexec_slow_queries_total", "Requests over SLOW_QUERY_MS.", "counter", ("endpoint",))
+M_ADMISSION = Metric("dataexec_admission_total", "Admission decisions per class.", "counter", ("class", "result"))
+M_ADMIT_WAIT = Metric("dataexec_admission_wait_seconds", "Time queued for an admission slot.", "histogram", ("class",))
+M_TRUNCATED = Metric("dataexec_truncated_total", "JSON results cut at MAX_JSON_ROWS/MAX_JSON_BYTES.",
+                     "counter", ("endpoint", "reason"))
+METRICS = [M_REQUEST_SECONDS, M_VIEW_SECONDS, M_ROWS, M_BYTES, M_CACHE, M_ERRORS, M_SLOW,
+           M_ADMISSION, M_ADMIT_WAIT, M_TRUNCATED]
+# names after FROM/JOIN that are not table functions, e.g. products or services.contracts_raw
+_SQL_REFS = re.compile(r"\b(?:from|join)\s+([A-Za-z_][\w.]*)\b(?![\w.]|\s*\()", re.I)
+def _sql_views(sql: str) -> set[str]:
+    return {m.lower() for m in _SQL_REFS.findall(sql)}
+def _route_label(scope) -> str:
+    for route in app.router.routes:
+        if route.matches(scope)[0] == Match.FULL:
+            return route.path
+    return "unmatched"  # raw paths would make a series per URL
+# ---- slow-query log ----
+SLOW_EXEC = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slowlog")
+_SLOW_PENDING = [0]
+_SLOW_LOCK = threading.Lock()
+def _sql_literal(v) -> str:
+    if v is None:
+        return "NULL"
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        return repr(v)
+    return "'" + str(v).replace("'", "''") + "'"
+def _inline_params(sql: str, params: dict) -> str:
+    # EXPLAIN ANALYZE does not take $named parameters in this DuckDB, so inline them as literals
+    return re.sub(r"\$(\w+)", lambda m: _sql_literal(params[m.group(1)]) if m.group(1) in params else m.group(0), sql)
+def _profile(scope: str, sql: str, params) -> str:
+    # re-runs the query, so only plain reads are profiled
+    if not _CACHEABLE.match(sql):
+        return "not profiled (not a read)"
+    if scope.startswith("sqlite2:"):
+        with NAMED_POOLS["products"].lease() as con:
+            return "\n".join(r[-1] for r in con.execute("EXPLAIN QUERY PLAN " + sql, params or ()).fetchall())
+    if params:
+        q = QUERIES.queries.get(scope[2:]) if scope.startswith("q:") else None
+        sql = QUERIES.inline(q, params) if q and q["sql"] == sql else _inline_params(sql, params)
+    if scope.startswith("duck2:"):
+        with NAMED_POOLS[scope.split(":", 1)[1]].lease() as con:
+            rows = con.execute("EXPLAIN ANALYZE " + sql).fetchall()
+    else:
+        with DUCK_POOL.lease() as cur:
+            rows = cur.execute("EXPLAIN ANALYZE " + sql).fetchall()
+    return "\n".join(r[-1] for r in rows)
+def _log_slow(entry: dict, profile: bool):
+    try:
+        if profile:
+            try:
+                entry["profile"] = _profile(entry["scope"], entry["sql"], entry.pop("params", None))
+            except Exception as e:
+                entry["profile"] = f"unavailable: {e}"
+        entry.pop("params", None)
+        os.makedirs(os.path.dirname(SLOW_QUERY_LOG) or ".", exist_ok=True)
+        with open(SLOW_QUERY_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+    finally:
+        with _SLOW_LOCK:
+            _SLOW_PENDING[0] -= 1
+def _slow_query(endpoint: str, secs: float, note: dict):
+    M_SLOW.inc(endpoint=endpoint)
+    print(f"[slow] {endpoint} {secs * 1000:.0f}ms {note['sql'][:200]!r}")
+    entry = {"ts": dt.datetime.utcnow().isoformat(), "endpoint": endpoint, "ms": round(secs * 1000, 1),
+             "scope": note.get("scope", "duck"), "sql": note["sql"], "params": note.get("params"),
+             "rows": note.get("rows", 0), "cached": note.get("cache") == "hit"}
+    with _SLOW_LOCK:
+        # a burst of slow queries must not queue a burst of re-runs behind it
+        profile = _SLOW_PENDING[0] < 4 and not entry["cached"]
+        _SLOW_PENDING[0] += 1
+    SLOW_EXEC.submit(_log_slow, entry, profile)
+def _observe(scope, status: int, secs: float, note: dict, nbytes: int):
+    endpoint = _route_label(scope)
+    M_REQUEST_SECONDS.observe(secs, endpoint=endpoint, method=scope.get("method", ""), status=status)
+    M_BYTES.inc(nbytes, endpoint=endpoint)
+    if note.get("rows"):
+        M_ROWS.inc(note["rows"], endpoint=endpoint)
+    if "cache" in note:
+        M_CACHE.inc(endpoint=endpoint, result=note["cache"])
+    if "truncated" in note:
+        M_TRUNCATED.inc(endpoint=endpoint, reason=note["truncated"])
+    if status >= 500 or "error" in note:
+        M_ERRORS.inc(endpoint=endpoint, type=note.get("error", f"http_{status}"))
+    sql = note.get("sql")
+    if sql:
+        for view in _sql_views(sql):
+            M_VIEW_SECONDS.observe(secs, source=note.get("scope", "duck"), view=view)
+        if 0 < SLOW_QUERY_MS <= secs * 1000:
+            _slow_query(endpoint, secs, note)
+@app.middleware("http")
+async def _instrument(request, call_next):
+    note = {}
+    token = _REQ_NOTE.set(note)
+    t0 = time.perf_counter()
+    try:
+        response = await call_next(request)
     except Exception:
+        _observe(request.scope, 500, time.perf_counter() - t0, note, 0)
+        raise
+    finally:
+        _REQ_NOTE.reset(token)
+    body = response.body_iterator
+    async def counted():
+        # streamed exports are measured until their last chunk, not until the headers
+        n = 0
+        try:
+            async for chunk in body:
+                n += len(chunk)
+                yield chunk
+        finally:
+            _observe(request.scope, response.status_code, time.perf_counter() - t0, note, n)
+    response.body_iterator = counted()
+    return response
+# ========= RESULT CACHE =========
+class ResultCache:
+    """LRU of query results held as Arrow tables, bounded by their in-memory size."""
+    def __init__(self, budget_bytes: int):
+        self.budget = int(budget_bytes)
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = self.hits = self.misses = self.evictions = 0
+    def get(self, key):
+        with self._lock:
+            t = self._items.get(key)
+            if t is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return t
+    def put(self, key, table: pa.Table):
+        # a single result may use at most a quarter of the budget
+        if table.nbytes > self.budget // 4:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= old.nbytes
+            self._items[key] = table
+            self.bytes += table.nbytes
+            while self.bytes > self.budget:
+                _, t = self._items.popitem(last=False)
+                self.bytes -= t.nbytes
+                self.evictions += 1
+    def purge(self) -> int:
+        with self._lock:
+            n = len(self._items)
+            self._items.clear()
+            self.bytes = 0
+        return n
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self.bytes, "budget": self.budget,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+RESULT_CACHE = ResultCache(RESULT_CACHE_MB * 1024 * 1024)
+# Only plain reads are cached; anything else (DDL, SET, ATTACH...) runs every time
+_CACHEABLE = re.compile(r"^[\s(]*(select|with|from|values|describe|show|summarize|table|pivot|unpivot)\b", re.I)
+_SQL_TOKENS = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|\s+")
+def _norm_sql(sql: str) -> str:
+    # collapse whitespace outside string literals and quoted identifiers
+    return _SQL_TOKENS.sub(lambda m: m.group(1) or " ", sql).strip().rstrip(";").strip()
+def _sources_sig() -> tuple:
+    out = []
+    for p in (DUCK_SERVICES, DUCK_MINISTRY, DUCK_STATE, SQLITE_PRODUCTS):
+        try:
+            st = os.stat(p)
+            out.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            out.append(None)
+    return tuple(out)
+def _cached(scope: str, sql: str, run, params: dict | None = None) -> tuple[pa.Table, bool]:
+    """Return (table, hit). `run()` produces the Arrow table on a miss; results are keyed
+    on the normalized SQL, its bound params and the mtimes/sizes of the source database files."""
+    _note(sql=sql, scope=scope, **({"params": params} if params else {}))
+    if RESULT_CACHE.budget <= 0 or not _CACHEABLE.match(sql):
+        return run(), False
+    key = (scope, _norm_sql(sql), json.dumps(params, sort_keys=True) if params else None, _sources_sig())
+    t = RESULT_CACHE.get(key)
+    _note(cache="miss" if t is None else "hit")
+    if t is not None:
+        return t, True
+    t = run()
+    RESULT_CACHE.put(key, t)
+    return t, False
+def _records(t: pa.Table) -> list[dict]:
+    _note(rows=t.num_rows)
+    return t.to_pylist()
+def _capped(t: pa.Table) -> tuple[pa.Table, dict | None]:
+    """t cut to MAX_JSON_ROWS rows and about MAX_JSON_BYTES of Arrow data (JSON runs larger)."""
+    n, reason = t.num_rows, None
+    if MAX_JSON_ROWS and n > MAX_JSON_ROWS:
+        n, reason = MAX_JSON_ROWS, "MAX_JSON_ROWS"
+    if MAX_JSON_BYTES and n and t.nbytes * n / t.num_rows > MAX_JSON_BYTES:
+        n, reason = max(1, int(MAX_JSON_BYTES * t.num_rows / t.nbytes)), "MAX_JSON_BYTES"
+    if reason is None:
+        return t, None
+    _note(truncated=reason)
+    return t.slice(0, n), {"rows": t.num_rows, "returned": n, "reason": reason,
+                           "hint": f"use format={'|'.join(STREAM_MEDIA)}, /cursor or /jobs for the full result"}
+def _data(t: pa.Table, **extra) -> dict:
+    """{"ok": True, "data": rows, **extra}, capped; "truncated" tells the client what it missed."""
+    t, cut = _capped(t)
+    out = {"ok": True, "data": _records(t), **extra}
+    if cut:
+        out["truncated"] = cut
+    return out
+# ========= STREAMING =========
+STREAM_MEDIA = {
+    "arrow":   "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+    "ndjson":  "application/x-ndjson",
+    "csv":     "text/csv",
+}
+class _Sink:
+    """Write-only file object; drain() hands back the bytes written since the last drain."""
+    closed = False
+    def __init__(self):
+        self._parts, self._pos = [], 0
+    def write(self, b):
+        self._parts.append(bytes(b)); self._pos += len(b)
+        return len(b)
+    def tell(self):
+        return self._pos  # must keep growing: parquet footers record absolute offsets
+    def flush(self):
         pass
-    DUCK.register(view, df)
-    DUCK.execute(f"CREATE OR REPLACE VIEW {view} AS SELECT * FROM {view}")
+    def close(self):
+        self.closed = True
+    def drain(self) -> bytes:
+        out = b"".join(self._parts); self._parts = []
+        return out
+def _conform(b: pa.RecordBatch, schema: pa.Schema) -> pa.RecordBatch:
+    """b cast to schema; ValueError where a column changed type in a way the schema can't hold."""
+    if b.schema.equals(schema):
+        return b
+    cols = []
+    for f, c in zip(schema, b.columns):
+        if c.type != f.type:
+            try:
+                c = c.cast(f.type)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                raise ValueError(f"column {f.name!r} changed type mid-result ({f.type} -> {c.type}); "
+                                 "CAST it in the query or use format=json|ndjson|csv") from e
+        cols.append(c)
+    return pa.RecordBatch.from_arrays(cols, schema=schema)
+def _ndjson(b: pa.RecordBatch) -> bytes:
+    # dates as plain ISO dates, like the JSON responses (pandas would widen them to timestamps)
+    cols = [c.cast(pa.string()) if pa.types.is_date(c.type) else c for c in b.columns]
+    df = pa.RecordBatch.from_arrays(cols, names=b.schema.names).to_pandas()
+    return df.to_json(orient="records", lines=True, date_format="iso").encode("utf-8")
+def _encode_batches(batches, schema: pa.Schema, fmt: str):
+    """Yield encoded chunks for an iterable of record batches, one chunk per batch.
+    NDJSON and CSV take each batch as it comes; Arrow and Parquet need every batch in `schema`."""
+    sink = _Sink()
+    if fmt == "arrow":
+        w = pa.ipc.new_stream(sink, schema)
+    elif fmt == "parquet":
+        w = pq.ParquetWriter(sink, schema)
+    elif fmt == "csv":
+        w = pacsv.CSVWriter(sink, schema)
+    else:
+        w = None
+    for b in batches:
+        _note(rows=b.num_rows)
+        if w is None:
+            sink.write(_ndjson(b))
+        elif fmt == "csv":
+            try:
+                w.write_batch(_conform(b, schema))
+            except ValueError:
+                pacsv.write_csv(b, sink, pacsv.WriteOptions(include_header=False))
+        elif fmt == "parquet":
+            w.write_table(pa.Table.from_batches([_conform(b, schema)], schema=schema))
+        else:
+            w.write_batch(_conform(b, schema))
+        chunk = sink.drain()
+        if chunk:
+            yield chunk
+    if w is not None:
+        w.close()
+    tail = sink.drain()
+    if tail:
+        yield tail
+def _stream_response(reader: pa.RecordBatchReader, fmt: str, on_close=None, headers: dict | None = None) -> StreamingResponse:
+    """Stream a record-batch reader in `fmt`; on_close runs once the body is done (or aborted).
+
+    Every batch is cast to the first batch's schema (_conform). When one cannot be, e.g. a SQLite
+    column that turns from numbers to text in arrow/parquet, the 200 and part of the body are
+    already out: the stream is then cut without its closing chunk, so clients get an incomplete
+    transfer error (httpx RemoteProtocolError, urllib IncompleteRead), never a short body that
+    looks complete; the cause is logged as "[stream] aborted" and counted as a stream_aborted error."""
+    def body():
+        try:
+            yield from _encode_batches(reader, reader.schema, fmt)
+        except Exception as e:
+            _note(error="stream_aborted")
+            print(f"[stream] aborted {fmt} export after the headers: {e}")
+            raise
+        finally:
+            if on_close:
+                on_close()
+    ext = {"arrow": "arrows"}.get(fmt, fmt)
+    return StreamingResponse(body(), media_type=STREAM_MEDIA[fmt],
+                             headers={"Content-Disposition": f"attachment; filename=result.{ext}", **(headers or {})})
+def _sqlite_array(col, t: pa.DataType | None = None) -> pa.Array:
+    # SQLite is dynamically typed: let Arrow infer (int + real → double), keep text where
+    # values really conflict, then cast into the column's established type only if that's lossless
+    try:
+        a = pa.array(col)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        a = pa.array([v if v is None or isinstance(v, str) else str(v) for v in col], type=pa.string())
+    if t is not None and a.type != t:
+        try:
+            a = a.cast(t)  # checked: 2.5 never becomes 2, 'x' never becomes NULL
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            pass
+    return a
+class _SqliteBatches:
+    """Record batches from a SQLite cursor. `schema` is the first batch's; a later batch keeps
+    its own column type where values no longer fit (never NULLs them), see _conform."""
+    def __init__(self, cur: sqlite3.Cursor, size: int = STREAM_BATCH_ROWS):
+        self.cur, self.size = cur, size
+        self.names = [d[0] for d in cur.description or []]
+        self.first = cur.fetchmany(size)
+        self.schema = self._batch(self.first, None).schema if self.first else \
+            pa.schema([pa.field(n, pa.string()) for n in self.names])
+    def _batch(self, rows: list, schema: pa.Schema | None) -> pa.RecordBatch:
+        arrays = []
+        for i, col in enumerate(zip(*rows)):
+            a = _sqlite_array(col, schema.field(i).type if schema is not None else None)
+            if pa.types.is_null(a.type):
+                a = a.cast(pa.string())
+            arrays.append(a)
+        return pa.RecordBatch.from_arrays(arrays, names=self.names)
+    def __iter__(self):
+        rows = self.first
+        while rows:
+            yield self._batch(rows, self.schema)
+            rows = self.cur.fetchmany(self.size)
+    def read_all(self) -> pa.Table:
+        """The whole result; a column whose type differs between batches becomes double when all
+        its parts are numeric and text otherwise (like the object columns pandas would give)."""
+        batches = list(self)
+        fields = []
+        for i, f in enumerate(self.schema):
+            types = {b.column(i).type for b in batches} or {f.type}
+            t = types.pop() if len(types) == 1 else \
+                pa.float64() if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in types) else pa.string()
+            fields.append(pa.field(f.name, t))
+        schema = pa.schema(fields)
+        return pa.Table.from_batches([_conform(b, schema) for b in batches], schema=schema)
+def _sqlite_reader(cur: sqlite3.Cursor, size: int = STREAM_BATCH_ROWS) -> _SqliteBatches:
+    return _SqliteBatches(cur, size)
 # ========= IN-MEMORY DUCKDB =========
-DUCK = duckdb.connect(database=":memory:")
-DUCK.execute("PRAGMA threads=4;")
+DUCK_LIMITS = {"threads": DUCK_THREADS, **({"memory_limit": DUCK_MEMORY_LIMIT} if DUCK_MEMORY_LIMIT else {})}
+DUCK = duckdb.connect(database=":memory:", config={
+    **DUCK_LIMITS, "temp_directory": _norm_path(DUCK_TEMP_DIR),
+    **({"max_temp_directory_size": DUCK_TEMP_MAX} if DUCK_TEMP_MAX else {})})
+_MEM_UNITS = {"b": 1, "bytes": 1, "kb": 1000, "mb": 1000 ** 2, "gb": 1000 ** 3, "tb": 1000 ** 4,
+              "kib": 1024, "mib": 1024 ** 2, "gib": 1024 ** 3, "tib": 1024 ** 4}
+def _mem_bytes(size: str) -> int:
+    m = re.fullmatch(r"([\d.]+)\s*([a-z]+)", size.strip().lower())
+    if not m or m.group(2) not in _MEM_UNITS:
+        raise ValueError(f"unreadable memory size {size!r}")
+    return int(float(m.group(1)) * _MEM_UNITS[m.group(2)])
+# the budget as DuckDB resolved it (DUCK_MEMORY_LIMIT, or its share of RAM); DUCK keeps what /duck2 does not get
+DUCK_BUDGET = _mem_bytes(DUCK.execute("SELECT current_setting('memory_limit')").fetchone()[0])
+DUCK.execute(f"SET memory_limit = '{int(DUCK_BUDGET * (1 - DUCK2_MEMORY_SHARE))}B';")
 DUCK.execute("INSTALL sqlite; LOAD sqlite;")
+# search_path is per connection, so every cursor repeats it (see _duck_cursor)
+CATALOG_SEARCH_PATH = "SET search_path = 'memory.main,catalog.main';"
+if USE_CATALOG:
+    if not os.path.exists(CATALOG_DB):
+        raise RuntimeError(f"USE_CATALOG=1 but {CATALOG_DB} not found; run python build_catalog.py first")
+    DUCK.execute(f"ATTACH '{_norm_path(CATALOG_DB)}' AS catalog (READ_ONLY);")
+    DUCK.execute(CATALOG_SEARCH_PATH)
+def _duck_cursor(con: duckdb.DuckDBPyConnection | None = None) -> duckdb.DuckDBPyConnection:
+    """New cursor on DUCK set up like DUCK itself (sqlite loaded, catalog on the search path)."""
+    cur = (con or DUCK).cursor()
+    cur.execute("LOAD sqlite;")
+    if USE_CATALOG:
+        cur.execute(CATALOG_SEARCH_PATH)
+    return cur
+READY = threading.Event()  # set once the warm-up has mounted every view
+def _await_ready():
+    if not READY.wait(MOUNT_WAIT):
+        raise RuntimeError(f"views still mounting after {MOUNT_WAIT:g}s; see /ready")
+class CursorPool:
+    """Fixed set of cursors on one DuckDB connection. Cursors share its catalog (views,
+    ATTACHed svc/cen/sta) but run independently; callers queue when all are busy."""
+    def __init__(self, con: duckdb.DuckDBPyConnection, size: int, wait: float):
+        self.size, self.wait = max(1, size), wait
+        self._idle = queue.LifoQueue()
+        for _ in range(self.size):
+            self._idle.put(_duck_cursor(con))
+    def acquire(self) -> duckdb.DuckDBPyConnection:
+        _await_ready()
+        try:
+            return self._idle.get(timeout=self.wait or None)
+        except queue.Empty:
+            raise RuntimeError(f"all {self.size} duckdb cursors busy for {self.wait:g}s") from None
+    def release(self, cur: duckdb.DuckDBPyConnection):
+        self._idle.put(cur)
+    @contextlib.contextmanager
+    def lease(self, timeout: float | None = None):
+        """Borrow a cursor; a query still running after `timeout` seconds
+        (default DUCK_QUERY_TIMEOUT) is interrupted."""
+        timeout = DUCK_QUERY_TIMEOUT if timeout is None else timeout
+        cur = self.acquire()
+        fired = threading.Event()
+        def _expire():
+            fired.set()
+            cur.interrupt()
+        timer = threading.Timer(timeout, _expire) if timeout else None
+        if timer:
+            timer.daemon = True
+            timer.start()
+        try:
+            yield cur
+        except duckdb.InterruptException:
+            if fired.is_set():
+                raise TimeoutError(f"query cancelled after {timeout:g}s (DUCK_QUERY_TIMEOUT)") from None
+            raise
+        finally:
+            if timer:
+                timer.cancel()
+            self.release(cur)
+DUCK_POOL = CursorPool(DUCK, DUCK_POOL_SIZE, DUCK_POOL_WAIT)
+# ========= ADMISSION =========
+class Overloaded(RuntimeError):
+    """A concurrency class is full; _fail turns it into a 429 carrying the class stats."""
+    def __init__(self, msg: str, stats: dict):
+        super().__init__(msg)
+        self.stats = stats
+class Admission:
+    """At most `limit` requests of one class run at once; the rest queue for up to `wait` seconds
+    and are then rejected, so a burst of exports cannot take the slots small queries need."""
+    def __init__(self, name: str, limit: int, wait: float):
+        self.name, self.limit, self.wait = name, max(1, limit), wait
+        self._slots = threading.BoundedSemaphore(self.limit)
+        self._lock = threading.Lock()
+        self.running = self.queued = self.admitted = self.rejected = 0
+    def stats(self) -> dict:
+        return {"class": self.name, "limit": self.limit, "running": self.running, "queued": self.queued,
+                "admitted": self.admitted, "rejected": self.rejected}
+    def refuse(self, why: str) -> Overloaded:
+        with self._lock:
+            self.rejected += 1
+        M_ADMISSION.inc(**{"class": self.name, "result": "rejected"})
+        return Overloaded(f"{self.name} queries at capacity: {why}", self.stats())
+    def acquire(self, wait: float | None = None):
+        wait = self.wait if wait is None else wait
+        t0 = time.perf_counter()
+        with self._lock:
+            self.queued += 1
+        try:
+            got = self._slots.acquire(timeout=wait if wait > 0 else None)
+        finally:
+            with self._lock:
+                self.queued -= 1
+        M_ADMIT_WAIT.observe(time.perf_counter() - t0, **{"class": self.name})
+        if not got:
+            raise self.refuse(f"{self.limit} running, waited {wait:g}s")
+        with self._lock:
+            self.running += 1
+            self.admitted += 1
+        M_ADMISSION.inc(**{"class": self.name, "result": "admitted"})
+    def release(self):
+        with self._lock:
+            self.running -= 1
+        self._slots.release()
+    @contextlib.contextmanager
+    def slot(self, wait: float | None = None):
+        self.acquire(wait)
+        try:
+            yield
+        finally:
+            self.release()
+ADMISSION = {"interactive": Admission("interactive", ADMIT_INTERACTIVE, ADMIT_WAIT),
+             "export": Admission("export", ADMIT_EXPORT, ADMIT_WAIT),
+             "job": Admission("job", JOB_WORKERS, 0)}  # JOB_EXEC queues; only a full JOBS table rejects
+INTERACTIVE, EXPORT = ADMISSION["interactive"], ADMISSION["export"]
+# ========= NAMED DB POOLS =========
+def _file_sig(path: str) -> tuple:
+    st = os.stat(path)
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+class FilePool:
+    """Long-lived read-only connections to one database file. Idle connections are pinged
+    before reuse and reopened once the file is replaced or rewritten (inode/mtime/size)."""
+    def __init__(self, path: str, opener, size: int = NAMED_POOL_SIZE, wait: float = DUCK_POOL_WAIT):
+        self.path, self.opener = path, opener
+        self.size, self.wait = max(1, size), wait
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._idle = []   # (con, file sig at open, last used), most recently used last
+        self._out = {}    # id(con) -> file sig, for leased connections
+        self.retired = False
+    @staticmethod
+    def _close(con):
+        try:
+            con.close()
+        except Exception:
+            pass
+    @staticmethod
+    def _alive(con) -> bool:
+        try:
+            con.execute("SELECT 1").fetchall()
+            return True
+        except Exception:
+            return False
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.wait or None):
+            raise RuntimeError(f"all {self.size} connections to {self.path} busy for {self.wait:g}s")
+        try:
+            sig = _file_sig(self.path)
+            while True:
+                with self._lock:
+                    con, con_sig, used = self._idle.pop() if self._idle else (None, None, 0.0)
+                if con is None:
+                    con, con_sig = self.opener(self.path), sig
+                elif con_sig != sig or (time.monotonic() - used > POOL_PING_SECS and not self._alive(con)):
+                    self._close(con)
+                    continue
+                with self._lock:
+                    self._out[id(con)] = con_sig
+                return con
+        except BaseException:
+            self._slots.release()
+            raise
+    def release(self, con, broken: bool = False):
+        with self._lock:
+            sig = self._out.pop(id(con), None)
+            keep = not broken and not self.retired
+            if keep:
+                self._idle.append((con, sig, time.monotonic()))
+        if not keep:
+            self._close(con)
+        self._slots.release()
+    def drain(self):
+        """Close the idle connections now and leased ones as they come back (the file is retired)."""
+        with self._lock:
+            self.retired, idle, self._idle = True, self._idle, []
+        for con, _, _ in idle:
+            self._close(con)
+    @contextlib.contextmanager
+    def lease(self):
+        con = self.acquire()
+        try:
+            yield con
+        finally:
+            self.release(con)
+def _open_duck_ro(path: str) -> duckdb.DuckDBPyConnection:
+    # the pool's connections to one file share its instance, and with it DUCK2_LIMITS
+    return duckdb.connect(path, read_only=True, config=DUCK2_LIMITS)
+def _open_sqlite_ro(path: str, immutable: bool | None = None) -> sqlite3.Connection:
+    p = pathlib.Path(path).resolve()
+    if immutable is None:
+        immutable = p in SQLITE_IMMUTABLE
+    uri = p.as_uri() + "?mode=ro" + ("&immutable=1" if immutable else "")
+    # connections are handed between threadpool workers, never used by two at once
+    con = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    con.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES};")
+    con.execute("PRAGMA query_only=1;")
+    return con
+NAMED_DUCK = {"services": DUCK_SERVICES, "ministry": DUCK_MINISTRY, "state": DUCK_STATE}
+# /duck2 files spill next to the file; each gets an even part of DUCK2_MEMORY_SHARE of the budget
+DUCK2_LIMITS = {"threads": DUCK_THREADS, "memory_limit": f"{int(DUCK_BUDGET * DUCK2_MEMORY_SHARE / len(NAMED_DUCK))}B"}
+NAMED_POOLS = {name: FilePool(path, _open_duck_ro) for name, path in NAMED_DUCK.items()}
+NAMED_POOLS["products"] = FilePool(SQLITE_PRODUCTS, _open_sqlite_ro)
+# BM25 indexes may be rebuilt in place (WAL) while we serve, so never open them immutable
+BM25_POOLS = {name: FilePool(path, lambda p: _open_sqlite_ro(p, immutable=False)) for name, path in BM25_DB.items()}
+# Serve static assets (optional)
+if ASSETS_DIR and os.path.isdir(ASSETS_DIR):
+    app.mount("/assets", StaticFiles(directory=ASSETS_DIR), name="assets")
 # ========= SQL SOURCES (Products SQLite + 3 DuckDBs) =========
 def mount_sql_sources():
-    # Serve static assets (optional)
-    if ASSETS_DIR and os.path.isdir(ASSETS_DIR):
-        app.mount("/assets", StaticFiles(directory=ASSETS_DIR), name="assets")
+    mount_products()
+    mount_services()
+    mount_ministry()
+    mount_state()
+    mount_contracts_all()
+def mount_products():
     # =================== PRODUCTS (SQLite) — raw + normalized ===================
     prod_table = os.getenv("SQLITE_PRODUCTS_TABLE") or _pick_products_table(SQLITE_PRODUCTS)
     DUCK.execute(f"""
@@ -121,7 +867,7 @@ def mount_sql_sources():
         else ("t.dept" if "dept" in prod_cols else "NULL::VARCHAR")
     )
     DUCK.execute(f"""
-      CREATE OR REPLACE VIEW products AS
+      CREATE OR REPLACE VIEW products_live AS
       SELECT
         CAST(t.s_no AS VARCHAR)                                        AS s_no,
         t.contract_no                                                  AS contract_no,
@@ -148,6 +894,9 @@ def mount_sql_sources():
         t.ingested_at                                                  AS ingested_at
       FROM v_products_raw AS t;
     """)
+    # `products` reads the snapshot once one exists (see ProductsSnapshot)
+    PRODUCTS_SNAPSHOT.point_view()
+def mount_services():
     # =================== SERVICES (DuckDB) ===================
     _duck_attach_readonly(DUCK, DUCK_SERVICES, "svc")
     DUCK.execute(f"""
@@ -184,6 +933,7 @@ def mount_sql_sources():
         t.imported_at                      AS imported_at
       FROM v_services_raw t;
     """)
+def mount_ministry():
     # =================== MINISTRY (DuckDB) ===================
     _duck_attach_readonly(DUCK, DUCK_MINISTRY, "cen")
     DUCK.execute(f"""
@@ -220,6 +970,7 @@ def mount_sql_sources():
         t.imported_at                      AS imported_at
       FROM v_ministry_raw t;
     """)
+def mount_state():
     # =================== STATE (DuckDB) ===================
     _duck_attach_readonly(DUCK, DUCK_STATE, "sta")
     DUCK.execute(f"""
@@ -256,12 +1007,808 @@ def mount_sql_sources():
         t.imported_at                      AS imported_at
       FROM v_state_raw t;
     """)
+def mount_contracts_all():
+    # =================== ALL CONTRACTS (union of the four) ===================
+    DUCK.execute("""
+      CREATE OR REPLACE VIEW contracts_all AS
+      SELECT 'products' AS source, * FROM products
+      UNION ALL BY NAME SELECT 'services' AS source, * FROM services
+      UNION ALL BY NAME SELECT 'ministry' AS source, * FROM ministry
+      UNION ALL BY NAME SELECT 'state'    AS source, * FROM state;
+    """)
+# ========= PRODUCTS SNAPSHOT =========
+class ProductsSnapshot:
+    """Materialized copy of the normalized products view (PRODUCTS_MATERIALIZE=table|parquet).
+    Refreshes only parse and cast rows at or past the newest ingested_at already copied
+    (deduplicated on row_sig); `products` is repointed in one statement once a refresh is done."""
+    MAX_PARTS = 64  # parquet mode: rewrite as one file past this many incremental parts
+    def __init__(self, mode: str, snap_dir: str):
+        self.mode, self.dir = mode, snap_dir
+        self.sig = None        # SQLITE_PRODUCTS signature at the last refresh
+        self.ready = False
+        self.last = {}
+        self._lock = threading.Lock()
+    def _parts(self) -> list[str]:
+        return sorted(_norm_path(str(p)) for p in pathlib.Path(self.dir).glob("part-*.parquet"))
+    def _snap_sql(self) -> str:
+        if self.mode == "table":
+            return "SELECT * FROM products_snap"
+        return "SELECT * FROM read_parquet([" + ", ".join(f"'{p}'" for p in self._parts()) + "])"
+    def point_view(self, con: duckdb.DuckDBPyConnection | None = None):
+        con = con or DUCK
+        if self.mode == "parquet" and self._parts():
+            self.ready = True  # reuse the parts written by an earlier run, then catch up
+        src = self._snap_sql() if self.ready else "SELECT * FROM products_live"
+        con.execute(f"CREATE OR REPLACE VIEW products AS {src};")
+    def refresh(self, full: bool = False) -> dict:
+        if self.mode not in ("table", "parquet"):
+            return {"mode": "live"}
+        with self._lock:
+            sig = _file_sig(SQLITE_PRODUCTS)
+            if sig == self.sig and self.ready and not full:
+                return {**self.last, "changed": False}
+            t0 = time.perf_counter()
+            con = _duck_cursor()
+            try:
+                if self.mode == "parquet" and len(self._parts()) >= self.MAX_PARTS:
+                    full = True
+                wm = None
+                if self.ready and not full:
+                    wm = con.execute(f"SELECT max(ingested_at) FROM ({self._snap_sql()})").fetchone()[0]
+                added = self._full(con) if wm is None else self._append(con, wm)
+                self.point_view(con)
+            finally:
+                con.close()
+            self.sig = sig
+            if added:
+                RESULT_CACHE.purge()
+            self.last = {"mode": self.mode, "full": wm is None, "rows_added": added,
+                         "watermark": str(wm) if wm is not None else None,
+                         "secs": round(time.perf_counter() - t0, 3), "changed": True}
+            print(f"[products] snapshot refresh {self.last}")
+            return self.last
+    def _full(self, con) -> int:
+        order = "SELECT * FROM products_live ORDER BY ingested_at"
+        if self.mode == "table":
+            con.execute(f"CREATE OR REPLACE TABLE products_snap AS {order};")
+            n = con.execute("SELECT count(*) FROM products_snap").fetchone()[0]
+        else:
+            os.makedirs(self.dir, exist_ok=True)
+            old = self._parts()
+            new = _norm_path(os.path.join(self.dir, f"part-{time.time_ns():020d}.parquet"))
+            n = con.execute(f"COPY ({order}) TO '{new}' (FORMAT PARQUET);").fetchone()[0]
+            # repoint before dropping the parts the current view still reads
+            con.execute(f"CREATE OR REPLACE VIEW products AS SELECT * FROM read_parquet(['{new}']);")
+            for p in old:
+                with contextlib.suppress(OSError):
+                    os.remove(p)
+        self.ready = True
+        return n
+    def _append(self, con, wm) -> int:
+        delta = f"""
+          SELECT l.* FROM products_live l
+          WHERE l.ingested_at >= $wm AND NOT EXISTS (
+            SELECT 1 FROM ({self._snap_sql()}) s
+            WHERE s.ingested_at >= $wm AND s.ingested_at = l.ingested_at AND s.row_sig = l.row_sig)
+          ORDER BY l.ingested_at"""
+        if self.mode == "table":
+            con.execute("BEGIN TRANSACTION;")
+            try:
+                n = con.execute(f"INSERT INTO products_snap {delta}", {"wm": wm}).fetchone()[0]
+                con.execute("COMMIT;")
+            except Exception:
+                con.execute("ROLLBACK;")
+                raise
+            return n
+        t = con.execute(delta, {"wm": wm}).arrow()
+        if t.num_rows:
+            pq.write_table(t, os.path.join(self.dir, f"part-{time.time_ns():020d}.parquet"))
+        return t.num_rows
+PRODUCTS_SNAPSHOT = ProductsSnapshot(PRODUCTS_MATERIALIZE, PRODUCTS_SNAPSHOT_DIR)
+# ========= ROLLUPS =========
+ROLLUP_DIMS = ["source", "ministry", "state", "department", "buying_mode", "month"]
+class Rollups:
+    """`rollup_contracts`: total, contract count and quantity over contracts_all at the finest
+    grain of ROLLUP_DIMS. Coarser GROUP BYs re-aggregate it instead of scanning the sources."""
+    def __init__(self):
+        self.sig = None
+        self.built_at = None
+        self._lock = threading.Lock()
+    def refresh(self, force: bool = False) -> dict:
+        with self._lock:
+            sig = _sources_sig()
+            if sig == self.sig and not force:
+                return {"changed": False, "built_at": self.built_at}
+            t0 = time.perf_counter()
+            con = _duck_cursor()
+            try:
+                con.execute("""
+                  CREATE OR REPLACE TABLE rollup_contracts AS
+                  SELECT source, ministry, state, department, buying_mode,
+                         CAST(date_trunc('month', contract_date) AS DATE) AS month,
+                         sum(total)            AS total,
+                         count(*)              AS contracts,
+                         sum(ordered_quantity) AS quantity
+                  FROM contracts_all
+                  GROUP BY ALL;
+                """)
+                n = con.execute("SELECT count(*) FROM rollup_contracts").fetchone()[0]
+            finally:
+                con.close()
+            self.sig, self.built_at = sig, dt.datetime.utcnow().isoformat()
+            out = {"changed": True, "built_at": self.built_at, "cells": n,
+                   "secs": round(time.perf_counter() - t0, 3)}
+            print(f"[rollup] rebuilt {out}")
+            return out
+ROLLUPS_CUBE = Rollups()
+# ========= CURSORS =========
+class LiveCursor:
+    """A DuckDB result kept open between requests; each page is fetched from where the last stopped."""
+    def __init__(self, sql: str):
+        _await_ready()
+        self.cur = _duck_cursor()
+        self.cur.execute(sql)
+        self.cols = [d[0] for d in self.cur.description or []]
+        self.lock = threading.Lock()
+        self.used = time.monotonic()
+        self.rows = 0
+    def page(self, n: int) -> tuple[list[dict], bool]:
+        with self.lock:
+            self.used = time.monotonic()
+            rows = self.cur.fetchmany(n)
+            self.rows += len(rows)
+            _note(rows=len(rows))
+            return [dict(zip(self.cols, r)) for r in rows], len(rows) < n
+    def close(self):
+        with contextlib.suppress(Exception):
+            self.cur.close()
+CURSORS: dict[str, LiveCursor] = {}
+_CURSORS_LOCK = threading.Lock()
+def _sweep_cursors():
+    now = time.monotonic()
+    with _CURSORS_LOCK:
+        stale = [cid for cid, c in CURSORS.items() if now - c.used > CURSOR_TTL]
+        for cid in stale:
+            CURSORS.pop(cid).close()
+    return len(stale)
+# keyset paging order for the contract views: (contract_date, contract_no, row_sig, occ[, source]),
+# each NULLS FIRST; _keyset_where spells out the NULL cases, so rows with NULL keys are still paged
+KEYSET_COLS = ["contract_date", "contract_no", "row_sig", "occ"]  # then `source` where the view has one
+def _keyset_order(cols: list[str]) -> str:
+    return ", ".join(f"{c} NULLS FIRST" for c in cols)
+def _keyset_where(cols: list[str], types: dict, key: list) -> tuple[str, dict]:
+    """Rows after `key` in _keyset_order(cols), spelled on the raw columns (no COALESCE) so the
+    leading bound is pushed into the scan instead of every page reading the whole view."""
+    cond, params = None, {}
+    for i in reversed(range(len(key))):
+        col = cols[i]
+        if key[i] is None:  # NULL sorts first: everything non-NULL is after it
+            gt, eq = f"{col} IS NOT NULL", f"{col} IS NULL"
+        else:
+            params[f"k{i}"] = key[i]
+            gt, eq = f"{col} > CAST($k{i} AS {types[col]})", f"{col} = CAST($k{i} AS {types[col]})"
+        cond = gt if cond is None else f"({gt} OR ({eq} AND {cond}))"
+    if key[0] is not None:
+        cond = f"{cols[0]} >= CAST($k0 AS {types[cols[0]]}) AND {cond}"
+    return f"WHERE {cond}", params
+def _keyset_token(row: dict, cols: list[str]) -> str:
+    key = [None if row.get(c) is None else row[c] if isinstance(row[c], (int, float)) else str(row[c]) for c in cols]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+def _keyset_parse(token: str, cols: list[str]) -> list:
+    key = json.loads(base64.urlsafe_b64decode(token.encode()))
+    if not isinstance(key, list) or not 0 < len(key) <= len(cols):
+        raise ValueError("malformed page token; pass back the `next` of an earlier page")
+    return key
+# ========= CHANGE FEED =========
+# Watermark column per view with a change feed. Rows come back ordered by (watermark, row_sig, occ);
+# the plain `>=` on the watermark is pushed into the scan, so DuckDB sources (appended in import
+# order) skip row groups by zonemap and products does on its ingested_at-sorted snapshot
+# (PRODUCTS_MATERIALIZE; the live sqlite_scan has no filter pushdown and reads every row)
+CHANGE_VIEWS = {"products": "ingested_at", "services": "imported_at", "ministry": "imported_at", "state": "imported_at"}
+def _change_token(wm, row_sig, occ) -> str:
+    return base64.urlsafe_b64encode(json.dumps([str(wm), row_sig or "", occ or 0]).encode()).decode()
+def _change_sql(view: str, col: str, wm_type: str, after: str, n: int) -> tuple[str, dict]:
+    try:
+        ts, sig, occ = json.loads(base64.urlsafe_b64decode(after.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("malformed change token; pass back the `next` of an earlier batch") from None
+    wm = f"CAST($ts AS {wm_type})"
+    sql = (f"SELECT * FROM {view} WHERE {col} >= {wm} AND ({col}, COALESCE(row_sig, ''), occ) > ({wm}, $sig, $occ) "
+           f"ORDER BY {col}, COALESCE(row_sig, ''), occ LIMIT $n")
+    return sql, {"ts": ts, "sig": sig, "occ": int(occ), "n": n}
+# ========= JOBS =========
+class Job:
+    """One submitted query: run by a JOB_EXEC worker on its own DUCK cursor and spooled to Parquet."""
+    def __init__(self, sql: str):
+        self.id = uuid.uuid4().hex
+        self.sql = sql.strip().rstrip(";").strip()
+        self.state = "queued"   # queued → running → done | failed | cancelled
+        self.submitted, self.started, self.finished = time.time(), None, None
+        self.rows = self.bytes = None
+        self.error = None
+        self.path = os.path.join(JOB_SPOOL_DIR, f"{self.id}.parquet")
+        self.cur = None
+        self.lock = threading.Lock()
+    def progress(self) -> float | None:
+        # DuckDB's query_progress (newer releases): percent done, -1 when unknown
+        fn = getattr(self.cur, "query_progress", None)
+        if self.state == "done":
+            return 100.0
+        if self.state != "running" or fn is None:
+            return None
+        with contextlib.suppress(Exception):
+            p = fn()
+            return round(p, 1) if p >= 0 else None
+        return None
+    def run(self):
+        with ADMISSION["job"].slot():
+            self._run()
+    def _run(self):
+        with self.lock:
+            if self.state != "queued":
+                return
+            self.state, self.started = "running", time.time()
+            self.cur = _duck_cursor()
+        tmp = self.path + ".tmp"
+        try:
+            # the newline closes a trailing "-- comment" before the paren that ends the subquery
+            self.cur.execute(f"COPY ({self.sql}\n) TO '{_norm_path(tmp)}' (FORMAT PARQUET)")
+            with self.lock:  # a cancel that lands after COPY returned still wins
+                if self.state == "running":
+                    os.replace(tmp, self.path)
+                    self.rows = pq.read_metadata(self.path).num_rows
+                    self.bytes = os.path.getsize(self.path)
+                    self.state = "done"
+        except Exception as e:
+            with self.lock:
+                if self.state == "running":
+                    cancelled = isinstance(e, duckdb.InterruptException)
+                    self.state, self.error = ("cancelled", None) if cancelled else ("failed", str(e))
+        finally:
+            with contextlib.suppress(OSError):
+                os.remove(tmp)
+            with self.lock:
+                self.finished = time.time()
+                with contextlib.suppress(Exception):
+                    self.cur.close()
+                self.cur = None
+    def cancel(self) -> bool:
+        with self.lock:
+            if self.state == "queued":
+                self.state, self.finished = "cancelled", time.time()
+                return True
+            if self.state == "running":
+                self.state = "cancelled"
+                self.cur.interrupt()
+                return True
+        return False
+    def remove(self):
+        with contextlib.suppress(OSError):
+            os.remove(self.path)
+    def info(self) -> dict:
+        return {"id": self.id, "state": self.state, "progress": self.progress(), "rows": self.rows,
+                "bytes": self.bytes, "error": self.error, "sql": self.sql,
+                "submitted": dt.datetime.utcfromtimestamp(self.submitted).isoformat(),
+                "elapsed": round((self.finished or time.time()) - (self.started or self.submitted), 3)}
+# separate from DUCK_POOL: at most JOB_WORKERS heavy queries run at once, the rest wait their turn
+JOB_EXEC = ThreadPoolExecutor(max_workers=max(1, JOB_WORKERS), thread_name_prefix="job")
+JOBS: dict[str, Job] = {}
+_JOBS_LOCK = threading.Lock()
+def _sweep_jobs():
+    """Forget finished jobs older than JOB_TTL and delete their spool files (also orphans from
+    earlier runs)."""
+    cutoff = time.time() - JOB_TTL
+    with _JOBS_LOCK:
+        old = [j for j in JOBS.values() if j.finished and j.finished < cutoff]
+        for j in old:
+            JOBS.pop(j.id).remove()
+        known = {os.path.basename(j.path) for j in JOBS.values()}
+    with contextlib.suppress(OSError):
+        for entry in os.scandir(JOB_SPOOL_DIR):
+            if entry.name.split(".")[0] + ".parquet" not in known and entry.stat().st_mtime < cutoff:
+                with contextlib.suppress(OSError):
+                    os.remove(entry.path)
+    return len(old)
+# ========= PARTITIONED PARQUET =========
+# contract views exported by PartitionExport, with the source file whose change triggers a refresh
+PARTITION_VIEWS = {"products": SQLITE_PRODUCTS, "services": DUCK_SERVICES, "ministry": DUCK_MINISTRY, "state": DUCK_STATE}
+_PART_YM = "COALESCE(year(contract_date), 0) * 100 + COALESCE(month(contract_date), 0)"
+class PartitionExport:
+    """`<view>_pq`: each contract view copied to PARTITION_DIR/<view>/year=YYYY/month=M/, sorted by
+    organization_name then contract_date so row-group stats skip on both. A refresh fingerprints
+    every month (row count + sum of row hashes) and rewrites only months that differ; undated rows
+    go to year=0/month=0."""
+    def __init__(self, root: str):
+        self.root = root
+        self.last = {}
+        self._lock = threading.Lock()
+    def _manifest_path(self, view: str) -> str:
+        return os.path.join(self.root, view, "_manifest.json")
+    def manifest(self, view: str) -> dict:
+        try:
+            with open(self._manifest_path(view), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    def point_view(self, view: str, parts: dict, con: duckdb.DuckDBPyConnection | None = None):
+        files = sorted(_norm_path(os.path.join(self.root, view, f)) for p in parts.values() for f in p["files"])
+        if files:
+            (con or DUCK).execute(f"CREATE OR REPLACE VIEW {view}_pq AS SELECT * FROM read_parquet(["
+                                  + ", ".join(f"'{f}'" for f in files) + "], hive_partitioning = true);")
+    def refresh(self, views: list[str] | None = None, full: bool = False) -> dict:
+        unknown = [v for v in views or [] if v not in PARTITION_VIEWS]
+        if unknown:
+            raise ValueError(f"unknown view(s) {unknown}; partitioned views are {list(PARTITION_VIEWS)}")
+        _await_ready()
+        with self._lock:
+            self.last = {v: self._refresh(v, full) for v in views or PARTITION_VIEWS}
+            return self.last
+    def _refresh(self, view: str, full: bool) -> dict:
+        old = self.manifest(view)
+        sig = list(_file_sig(PARTITION_VIEWS[view]))
+        if old.get("sig") == sig and not full:
+            return {"changed": False, "partitions": len(old.get("parts", {}))}
+        t0 = time.perf_counter()
+        con = _duck_cursor()
+        try:
+            fps = {f"{ym // 100}-{ym % 100:02d}": {"rows": n, "fp": str(h)} for ym, n, h in con.execute(
+                f"SELECT {_PART_YM} AS ym, count(*), sum(hash(v)) FROM {view} v GROUP BY ym").fetchall()}
+            parts = old.get("parts", {})
+            changed = sorted(k for k, p in fps.items()
+                             if full or (parts.get(k, {}).get("rows"), parts.get(k, {}).get("fp")) != (p["rows"], p["fp"]))
+            gone = [parts[k] for k in parts if k not in fps] + [parts[k] for k in changed if k in parts]
+            new_parts = {k: p for k, p in parts.items() if k in fps and k not in changed}
+            if changed:
+                stage = os.path.join(self.root, view, f"_stage-{time.time_ns()}")
+                os.makedirs(os.path.dirname(stage), exist_ok=True)
+                yms = ", ".join(str(int(k[:-3]) * 100 + int(k[-2:])) for k in changed)
+                try:
+                    con.execute(f"""
+                      COPY (SELECT *, COALESCE(year(contract_date), 0) AS year, COALESCE(month(contract_date), 0) AS month
+                            FROM {view} WHERE {_PART_YM} IN ({yms})
+                            ORDER BY year, month, organization_name, contract_date)
+                      TO '{_norm_path(stage)}' (FORMAT PARQUET, PARTITION_BY (year, month));""")
+                    stamp = time.time_ns()
+                    for k in changed:
+                        rel = f"year={int(k[:-3])}/month={int(k[-2:])}"
+                        os.makedirs(os.path.join(self.root, view, rel), exist_ok=True)
+                        files = []
+                        for i, src in enumerate(sorted(pathlib.Path(stage, rel).glob("*.parquet"))):
+                            files.append(f"{rel}/part-{stamp}-{i}.parquet")
+                            os.replace(src, os.path.join(self.root, view, files[-1]))
+                        new_parts[k] = {**fps[k], "files": files}
+                finally:  # a failed COPY or move must not leave the stage behind
+                    shutil.rmtree(stage, ignore_errors=True)
+            # repoint before dropping the files the current view still reads
+            self.point_view(view, new_parts, con)
+        finally:
+            con.close()
+        tmp = self._manifest_path(view) + ".tmp"
+        os.makedirs(os.path.dirname(tmp), exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"sig": sig, "parts": new_parts}, f)
+        os.replace(tmp, self._manifest_path(view))
+        for p in gone:
+            for rel in p["files"]:
+                with contextlib.suppress(OSError):
+                    os.remove(os.path.join(self.root, view, rel))
+        if changed or gone:
+            RESULT_CACHE.purge()
+        out = {"changed": True, "partitions": len(new_parts), "rewritten": len(changed),
+               "dropped": len([k for k in parts if k not in fps]), "secs": round(time.perf_counter() - t0, 3)}
+        print(f"[partitions] {view}_pq {out}")
+        return out
+PARTITIONS = PartitionExport(PARTITION_DIR)
+def mount_partition_views():
+    # views over partitions exported earlier; exporting itself is a refresh
+    for view in PARTITION_VIEWS:
+        parts = PARTITIONS.manifest(view).get("parts")
+        if parts:
+            PARTITIONS.point_view(view, parts)
+            print(f"[partitions] mounted view {view}_pq ({len(parts)} partitions)")
+# ========= CONTRACT TEXT SEARCH =========
+_CONTRACT_COLS = ["source", "contract_no", "contract_date", "ministry", "state", "department",
+                  "organization_name", "total", "product_name", "product_brand", "service_name", "row_sig"]
+class ContractIndex:
+    """SQLite FTS5 index over product_name/product_brand/service_name of contracts_all, next to the
+    filter columns. Every build is a new file next to CONTRACT_FTS_DB (<stem>-<ns><ext>); searches
+    lease from a FilePool on the newest one, and older builds are removed once nothing holds them
+    open (Windows neither replaces nor removes an open file, so a rename over a pooled file fails).
+    A refresh copies the newest build and appends the rows each source got at or past its watermark
+    (CHANGE_VIEWS), skipping (source, row_sig, occ) already indexed; when the counts then disagree
+    with the sources (rows removed or rewritten in place), or on force, it rebuilds from scratch."""
+    def __init__(self, path: str):
+        self.path = path
+        self.pool = FilePool(self.current() or path, _open_sqlite_ro)
+        self.last = {}
+        self._lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+    def versions(self) -> list[str]:
+        stem, ext = os.path.splitext(os.path.basename(self.path))
+        d = os.path.dirname(self.path) or "."
+        named = re.compile(re.escape(stem) + r"-(\d+)" + re.escape(ext))
+        found = sorted((int(m.group(1)), os.path.join(d, f)) for f in (os.listdir(d) if os.path.isdir(d) else [])
+                       if (m := named.fullmatch(f)))
+        # a CONTRACT_FTS_DB built before versioning is the oldest build
+        return ([self.path] if os.path.exists(self.path) else []) + [f for _, f in found]
+    def current(self) -> str | None:
+        v = self.versions()
+        return v[-1] if v else None
+    def meta(self, path: str | None = None) -> dict:
+        path = path or self.current()
+        if not path:
+            return {}
+        with contextlib.suppress(sqlite3.Error, ValueError):  # builds from before the JSON meta: rebuilt
+            con = sqlite3.connect(f"file:{_norm_path(path)}?mode=ro", uri=True)
+            try:
+                return {k: json.loads(v) for k, v in con.execute("SELECT key, value FROM meta")}
+            finally:
+                con.close()
+        return {}
+    def built_sig(self) -> list | None:
+        return self.meta().get("sources_sig")
+    def _lease(self):
+        path = self.current() or self.path
+        with self._pool_lock:
+            if self.pool.path != path:
+                old, self.pool = self.pool, FilePool(path, _open_sqlite_ro)
+                old.drain()
+            return self.pool.lease()
+    def refresh(self, force: bool = False) -> dict:
+        _await_ready()
+        with self._lock:
+            sig = json.loads(json.dumps(_sources_sig()))  # as stored in meta: lists, not tuples
+            base = self.current()
+            old = self.meta(base)
+            if not force and old.get("sources_sig") == sig:
+                return {"changed": False}
+            t0 = time.perf_counter()
+            stem, ext = os.path.splitext(self.path)
+            new = f"{stem}-{time.time_ns()}{ext}"
+            tmp = new + ".tmp"
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            cur = _duck_cursor()
+            try:
+                # rows and watermark per source, as they are now
+                stats = {s: [n, None if wm is None else str(wm)] for s, n, wm in cur.execute(" UNION ALL ".join(
+                    f"SELECT '{s}', count(*), max({col}) FROM contracts_all WHERE source = '{s}'"
+                    for s, col in CHANGE_VIEWS.items())).fetchall()}
+                appended = None
+                if not force and "watermarks" in old:
+                    shutil.copyfile(base, tmp)
+                    appended = self._append(tmp, cur, old["watermarks"], stats)
+                if appended is None:
+                    with contextlib.suppress(OSError):
+                        os.remove(tmp)
+                    n = self._build(tmp, cur)
+                else:
+                    n = appended
+                out = sqlite3.connect(tmp)
+                try:
+                    with out:
+                        out.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                        [("sources_sig", json.dumps(sig)), ("watermarks", json.dumps(stats)),
+                                         ("built_at", json.dumps(dt.datetime.utcnow().isoformat()))])
+                finally:
+                    out.close()
+            except BaseException:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp)
+                raise
+            finally:
+                cur.close()
+            os.replace(tmp, new)  # a fresh name: nothing has it open
+            with self._pool_lock:
+                old_pool, self.pool = self.pool, FilePool(new, _open_sqlite_ro)
+            old_pool.drain()
+            for p in self.versions():
+                if p != new:
+                    with contextlib.suppress(OSError):
+                        os.remove(p)  # still open elsewhere on Windows: the next refresh retries
+            self.last = {"changed": True, "incremental": appended is not None, "rows": n,
+                         "secs": round(time.perf_counter() - t0, 3)}
+            print(f"[contracts_fts] rebuilt {self.last}")
+            return self.last
+    @staticmethod
+    def _select(where: str = "") -> str:
+        return (f"SELECT {', '.join(_CONTRACT_COLS[:2])}, CAST(contract_date AS VARCHAR), "
+                f"{', '.join(_CONTRACT_COLS[3:])}, occ FROM contracts_all {where}")
+    @staticmethod
+    def _insert(out: sqlite3.Connection, cur, table: str) -> int:
+        n = 0
+        while rows := cur.fetchmany(STREAM_BATCH_ROWS):
+            out.executemany(f"INSERT INTO {table} ({', '.join(_CONTRACT_COLS)}, occ) "
+                            f"VALUES ({', '.join('?' * (len(_CONTRACT_COLS) + 1))})", rows)
+            n += len(rows)
+        return n
+    def _build(self, tmp: str, cur) -> int:
+        out = sqlite3.connect(tmp)
+        try:
+            out.execute("PRAGMA journal_mode=OFF")
+            out.execute("PRAGMA synchronous=OFF")
+            out.execute(f"CREATE TABLE contracts (id INTEGER PRIMARY KEY, {', '.join(_CONTRACT_COLS)}, occ)")
+            out.execute("""CREATE VIRTUAL TABLE contracts_fts USING fts5(product_name, product_brand, service_name,
+                           content='contracts', content_rowid='id', tokenize='unicode61 remove_diacritics 2')""")
+            cur.execute(self._select())
+            with out:
+                n = self._insert(out, cur, "contracts")
+                out.execute("INSERT INTO contracts_fts(contracts_fts) VALUES ('rebuild')")
+                out.execute("INSERT INTO contracts_fts(contracts_fts) VALUES ('optimize')")
+                for col in ("contract_date", "ministry", "state", "total"):
+                    out.execute(f"CREATE INDEX contracts_{col} ON contracts({col})")
+                out.execute("CREATE INDEX contracts_key ON contracts(source, row_sig, occ)")
+                out.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            return n
+        finally:
+            out.close()
+    def _append(self, tmp: str, cur, watermarks: dict, stats: dict) -> int | None:
+        """Rows added since the build copied to tmp; None when tmp has to be rebuilt instead."""
+        out = sqlite3.connect(tmp)
+        try:
+            out.execute("PRAGMA journal_mode=OFF")
+            out.execute("PRAGMA synchronous=OFF")
+            out.execute(f"CREATE TEMP TABLE delta ({', '.join(_CONTRACT_COLS)}, occ)")
+            with out:
+                for s, col in CHANGE_VIEWS.items():
+                    n, wm = watermarks.get(s, [0, None])
+                    if stats[s][0] < n:
+                        return None  # rows went away
+                    if stats[s][0] == n and stats[s][1] == wm:
+                        continue
+                    cur.execute(self._select(f"WHERE source = $s" + (f" AND {col} >= $wm" if wm is not None else "")),
+                                {"s": s, **({"wm": wm} if wm is not None else {})})
+                    self._insert(out, cur, "delta")
+                top = out.execute("SELECT COALESCE(max(id), 0) FROM contracts").fetchone()[0]
+                out.execute(f"""INSERT INTO contracts ({', '.join(_CONTRACT_COLS)}, occ)
+                                SELECT * FROM delta d WHERE NOT EXISTS (SELECT 1 FROM contracts c
+                                  WHERE c.source = d.source AND c.row_sig IS d.row_sig AND c.occ IS d.occ)""")
+                out.execute("""INSERT INTO contracts_fts(rowid, product_name, product_brand, service_name)
+                               SELECT id, product_name, product_brand, service_name FROM contracts WHERE id > ?""", (top,))
+                have = dict(out.execute("SELECT source, count(*) FROM contracts GROUP BY source").fetchall())
+                if any(have.get(s, 0) != n for s, (n, _) in stats.items()):
+                    return None  # rows rewritten under an old watermark
+                return out.execute("SELECT count(*) FROM contracts WHERE id > ?", (top,)).fetchone()[0]
+        finally:
+            out.close()
+    def search(self, q: str, k: int, match: str = "all", filters: dict | None = None) -> list[dict]:
+        words = re.findall(r"\w+", q)
+        if not words:
+            return []
+        # quoted terms: user text never reaches the FTS5 query syntax
+        expr = (" OR " if match == "any" else " AND ").join('"' + w + '"' for w in words)
+        where, params = ["contracts_fts MATCH ?"], [expr]
+        for col, op, val in filters or []:
+            where.append(f"c.{col} {op} ?")
+            params.append(val)
+        with self._lease() as con:
+            rows = con.execute(f"""
+              SELECT {', '.join('c.' + c for c in _CONTRACT_COLS)}, -bm25(contracts_fts, 2.0, 1.0, 2.0) AS score
+              FROM contracts_fts JOIN contracts c ON c.id = contracts_fts.rowid
+              WHERE {' AND '.join(where)}
+              ORDER BY score DESC LIMIT ?""", (*params, int(k))).fetchall()
+        return [dict(zip(_CONTRACT_COLS + ["score"], r)) for r in rows]
+CONTRACT_INDEX = ContractIndex(CONTRACT_FTS_DB)
+# ========= NAMED QUERIES =========
+# parameter type -> (SQL type, coercion of the JSON value)
+def _as_int(v):
+    if isinstance(v, bool) or not isinstance(v, (int, str)) or not re.fullmatch(r"-?\d+", str(v).strip()):
+        raise ValueError(f"expected an integer, got {v!r}")
+    return int(v)
+def _as_float(v):
+    f = float(v) if isinstance(v, (int, float, str)) and not isinstance(v, bool) else math.nan
+    if not math.isfinite(f):
+        raise ValueError(f"expected a finite number, got {v!r}")
+    return f
+def _as_bool(v):
+    if isinstance(v, bool) or str(v).lower() in ("true", "false"):
+        return v if isinstance(v, bool) else str(v).lower() == "true"
+    raise ValueError(f"expected true or false, got {v!r}")
+QUERY_PARAM_TYPES = {
+    "str":       ("VARCHAR",   str),
+    "int":       ("BIGINT",    _as_int),
+    "float":     ("DOUBLE",    _as_float),
+    "bool":      ("BOOLEAN",   _as_bool),
+    "date":      ("DATE",      lambda v: dt.date.fromisoformat(str(v))),
+    "timestamp": ("TIMESTAMP", lambda v: dt.datetime.fromisoformat(str(v))),
+}
+def _param_literal(typ: str, v) -> str:
+    """Typed SQL literal for an already coerced value (EXECUTE takes no bound parameters)."""
+    sql_type = QUERY_PARAM_TYPES[typ.removesuffix("[]")][0] + ("[]" if typ.endswith("[]") else "")
+    if v is None:
+        return f"CAST(NULL AS {sql_type})"
+    def lit(x):
+        if isinstance(x, bool):
+            return "TRUE" if x else "FALSE"
+        if isinstance(x, (int, float)):
+            return repr(x)
+        return "'" + str(x).replace("'", "''") + "'"  # str, and ISO text for date/timestamp
+    body = "[" + ", ".join(map(lit, v)) + "]" if typ.endswith("[]") else lit(v)
+    return f"CAST({body} AS {sql_type})"
+class QueryCatalog:
+    """Named read queries from QUERIES_FILE, reloaded when the file changes:
+
+        {"name": {"sql": "... WHERE ministry = $ministry AND contract_date >= $since",
+                  "params": {"ministry": "str", "since": {"type": "date", "default": "2020-01-01"}},
+                  "description": "..."}}
+
+    Types are QUERY_PARAM_TYPES, or a list of one ("str[]"). Each pooled cursor PREPAREs a query
+    the first time it runs it and afterwards only EXECUTEs it, so parsing and planning happen
+    once per cursor rather than once per request. A file that fails to load keeps the last good
+    catalog; the problem is shown by GET /q."""
+    def __init__(self, path: str):
+        self.path = path
+        self.sig = None
+        self.queries: dict[str, dict] = {}
+        self.error = None
+        self._lock = threading.Lock()
+        self._prepared: dict[int, set] = {}  # id(pooled cursor) -> statements prepared on it
+    @staticmethod
+    def _compile(name: str, spec: dict) -> dict:
+        if not re.fullmatch(r"[A-Za-z_]\w*", name):
+            raise ValueError(f"query name {name!r} is not an identifier")
+        sql = spec["sql"].strip().rstrip(";").strip()
+        if not _CACHEABLE.match(sql):
+            raise ValueError(f"{name}: only read queries (SELECT/WITH/...) can be named")
+        params = {p: d if isinstance(d, dict) else {"type": d} for p, d in spec.get("params", {}).items()}
+        for p, d in params.items():
+            if d.get("type", "").removesuffix("[]") not in QUERY_PARAM_TYPES:
+                raise ValueError(f"{name}.{p}: unknown type {d.get('type')!r}; use {list(QUERY_PARAM_TYPES)} or a list of one")
+        used = set(re.findall(r"\$(\w+)", sql))
+        if used != set(params):
+            raise ValueError(f"{name}: placeholders {sorted(used)} do not match params {sorted(params)}")
+        order = list(params)
+        positional = re.sub(r"\$(\w+)", lambda m: f"${order.index(m.group(1)) + 1}", sql)
+        stmt = f"q_{name}_{zlib.crc32(positional.encode()):08x}"  # changes with the SQL, so edits re-PREPARE
+        return {"name": name, "sql": sql, "params": params, "description": spec.get("description", ""),
+                "stmt": stmt, "prepare": f"PREPARE {stmt} AS {positional}"}
+    def sync(self) -> dict[str, dict]:
+        try:
+            sig = _file_sig(self.path)
+        except OSError:
+            sig = None
+        with self._lock:
+            if sig != self.sig:
+                self.sig = sig
+                try:
+                    raw = json.load(open(self.path, encoding="utf-8")) if sig else {}
+                    self.queries = {n: self._compile(n, spec) for n, spec in raw.items()}
+                    self.error = None
+                    print(f"[queries] loaded {len(self.queries)} named queries from {self.path}")
+                except Exception as e:
+                    self.error = f"{self.path}: {e}"
+                    print(f"[queries] keeping the previous catalog: {self.error}")
+        return self.queries
+    def get(self, name: str) -> dict:
+        q = self.sync().get(name)
+        if q is None:
+            raise LookupError(f"no named query '{name}'; see GET /q")
+        return q
+    @staticmethod
+    def bind(q: dict, given: dict) -> dict:
+        """Values for every parameter (given, else the default), coerced to their types."""
+        unknown = sorted(set(given) - set(q["params"]))
+        if unknown:
+            raise ValueError(f"unknown parameter(s) {unknown}; {q['name']} takes {list(q['params'])}")
+        out = {}
+        for p, d in q["params"].items():
+            if p in given:
+                v = given[p]
+            elif "default" in d:
+                v = d["default"]
+            else:
+                raise ValueError(f"missing parameter '{p}' ({d['type']})")
+            conv = QUERY_PARAM_TYPES[d["type"].removesuffix("[]")][1]
+            try:
+                if v is None:
+                    out[p] = None
+                elif d["type"].endswith("[]"):
+                    if not isinstance(v, list):
+                        raise ValueError(f"expected a list, got {v!r}")
+                    out[p] = [conv(x) for x in v]
+                else:
+                    out[p] = conv(v)
+            except ValueError as e:
+                raise ValueError(f"parameter '{p}' ({d['type']}): {e}") from None
+        return out
+    def execute(self, cur: duckdb.DuckDBPyConnection, q: dict, bound: dict) -> duckdb.DuckDBPyConnection:
+        done = self._prepared.setdefault(id(cur), set())
+        if q["stmt"] not in done:
+            cur.execute(q["prepare"])
+            done.add(q["stmt"])
+        args = ", ".join(_param_literal(d["type"], bound[p]) for p, d in q["params"].items())
+        return cur.execute(f"EXECUTE {q['stmt']}({args})" if args else f"EXECUTE {q['stmt']}")
+    @staticmethod
+    def inline(q: dict, values: dict) -> str:
+        """q's SQL with each $param as a literal of its declared type (lists as ['a', 'b']::VARCHAR[])."""
+        return re.sub(r"\$(\w+)", lambda m: _param_literal(q["params"][m.group(1)]["type"], values[m.group(1)]), q["sql"])
+QUERIES = QueryCatalog(QUERIES_FILE)
+# ========= MAINTENANCE =========
+# Callables run by the background refresher every REFRESH_SECS (first pass right after boot)
+MAINTENANCE = [_sweep_cursors, _sweep_jobs]
+if not USE_CATALOG:  # with a catalog, build_catalog.py owns the snapshot and the rollups
+    MAINTENANCE += [PRODUCTS_SNAPSHOT.refresh] + ([ROLLUPS_CUBE.refresh] if ROLLUPS else [])
+    MAINTENANCE += [PARTITIONS.refresh] if PARTITION_REFRESH else []
+    MAINTENANCE += [CONTRACT_INDEX.refresh] if CONTRACT_FTS else []
+STOP = threading.Event()  # set at shutdown so background threads leave DuckDB before exit
+def _maintenance_loop():
+    while not STOP.is_set():
+        for task in list(MAINTENANCE):
+            if STOP.is_set():
+                break
+            try:
+                task()
+            except Exception as e:
+                print(f"[refresh] {getattr(task, '__qualname__', task)} failed: {e}")
+        STOP.wait(REFRESH_SECS)
+# ========= JSON DOCUMENT CACHE =========
+def _loads(buf):
+    if JSON_PARSER == "orjson" and orjson is not None:
+        return orjson.loads(buf)
+    return json.loads(buf)
+def _read_json(path: str):
+    with open(path, "rb") as f:
+        if JSON_MMAP and JSON_PARSER == "orjson" and orjson is not None and os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m, memoryview(m) as mv:
+                return orjson.loads(mv)
+        return _loads(f.read())
+def _path_index(obj, prefix: str = "", out: dict | None = None) -> dict:
+    """Every dotted path reachable by _deep_get (dict keys, list positions) -> value."""
+    out = {} if out is None else out
+    if isinstance(obj, dict):
+        items = ((k, v) for k, v in obj.items() if isinstance(k, str) and "." not in k)
+    elif isinstance(obj, list):
+        items = ((str(i), v) for i, v in enumerate(obj))
+    else:
+        return out
+    for k, v in items:
+        path = f"{prefix}.{k}" if prefix else k
+        out[path] = v
+        _path_index(v, path, out)
+    return out
+class JsonDocs:
+    """Parsed JSON files from one directory, reparsed only when a file's mtime/size changes,
+    each with a precomputed dotted-path index for key lookups."""
+    def __init__(self, root: str):
+        self.root = root
+        self._docs = {}      # name -> (file sig, data, path index)
+        self._listing = (None, [])
+        self._lock = threading.Lock()
+        self.loads = 0
+    def _entry(self, name: str):
+        p = os.path.join(self.root, f"{name}.json")
+        st = os.stat(p)
+        sig = (st.st_mtime_ns, st.st_size)
+        hit = self._docs.get(name)
+        if hit and hit[0] == sig:
+            return hit
+        with self._lock:
+            hit = self._docs.get(name)
+            if not (hit and hit[0] == sig):
+                data = _read_json(p)
+                hit = (sig, data, _path_index(data))
+                self._docs[name] = hit
+                self.loads += 1
+        return hit
+    def data(self, name: str):
+        return self._entry(name)[1]
+    def lookup(self, name: str, key: str):
+        _, data, index = self._entry(name)
+        try:
+            return index[key]
+        except KeyError:
+            return _deep_get(data, key)  # non-canonical paths such as "-1"
+    def names(self) -> list[str]:
+        mtime = os.stat(self.root).st_mtime_ns
+        if self._listing[0] != mtime:
+            self._listing = (mtime, sorted(p.name for p in pathlib.Path(self.root).glob("*.json")))
+        return self._listing[1]
+JSON_DOCS = JsonDocs(JSON_DIR)
 # ========= JSON MOUNTS (matches the 8 files you shared) =========
 # ---- replace your existing mount_json_views() with this hardened version ----
 def mount_json_views():
     # central_portals.json → central_portals_v
     try:
-        cp = json.load(open(_json_path("central_portals.json"), "r", encoding="utf-8"))
+        cp = JSON_DOCS.data("central_portals")
         rows_in = _get_list(cp, "portals")
         out = []
         for r in rows_in:
@@ -279,7 +1826,7 @@ def mount_json_views():
         print(f"[json] central_portals mount skipped: {e}")
     # state_portals.json → state_portals_v
     try:
-        sp = json.load(open(_json_path("state_portals.json"), "r", encoding="utf-8"))
+        sp = JSON_DOCS.data("state_portals")
         rows_in = _get_list(sp, "portals")
         out = []
         for r in rows_in:
@@ -297,7 +1844,7 @@ def mount_json_views():
         print(f"[json] state_portals mount skipped: {e}")
     # ministry_metadata.json → ministry_meta_v
     try:
-        mm = json.load(open(_json_path("ministry_metadata.json"), "r", encoding="utf-8"))
+        mm = JSON_DOCS.data("ministry_metadata")
         rows_in = _get_list(mm, "ministries")
         out = [{"ministry": r.get("ministry"), "abbr": r.get("abbr"), "notes": r.get("notes")}
                for r in rows_in]
@@ -307,7 +1854,7 @@ def mount_json_views():
         print(f"[json] ministry_metadata mount skipped: {e}")
     # states_metadata.json → states_meta_v
     try:
-        sm = json.load(open(_json_path("states_metadata.json"), "r", encoding="utf-8"))
+        sm = JSON_DOCS.data("states_metadata")
         rows_in = _get_list(sm, "states")
         out = [{"state_code": r.get("state_code"),
                 "state_name": r.get("state_name"),
@@ -318,7 +1865,7 @@ def mount_json_views():
         print(f"[json] states_metadata mount skipped: {e}")
     # ministry_hierarchy.json → ministry_hierarchy_v
     try:
-        mh = json.load(open(_json_path("ministry_hierarchy.json"), "r", encoding="utf-8"))
+        mh = JSON_DOCS.data("ministry_hierarchy")
         nodes = _get_list(mh, "tree")
         out = []
         for t in nodes:
@@ -335,7 +1882,7 @@ def mount_json_views():
         print(f"[json] ministry_hierarchy mount skipped: {e}")
     # states_hierarchy.json → states_hierarchy_v
     try:
-        sh = json.load(open(_json_path("states_hierarchy.json"), "r", encoding="utf-8"))
+        sh = JSON_DOCS.data("states_hierarchy")
         nodes = _get_list(sh, "tree")
         out = []
         for t in nodes:
@@ -355,7 +1902,7 @@ def mount_json_views():
         print(f"[json] states_hierarchy mount skipped: {e}")
     # product_categories_metadata.json → product_categories_v
     try:
-        pc = json.load(open(_json_path("product_categories_metadata.json"), "r", encoding="utf-8"))
+        pc = JSON_DOCS.data("product_categories_metadata")
         rows_in = _get_list(pc, "categories")
         out = []
         for r in rows_in:
@@ -376,7 +1923,7 @@ def mount_json_views():
         print(f"[json] product_categories mount skipped: {e}")
     # service_categories_metadata.json → service_categories_v
     try:
-        sc = json.load(open(_json_path("service_categories_metadata.json"), "r", encoding="utf-8"))
+        sc = JSON_DOCS.data("service_categories_metadata")
         rows_in = _get_list(sc, "categories")
         out = []
         for r in rows_in:
@@ -396,71 +1943,621 @@ def mount_json_views():
     except Exception as e:
         print(f"[json] service_categories mount skipped: {e}")
 
+# ========= EXCEL SHEETS (Parquet cache → excel_<sheet>_v) =========
+def _excel_slug(sheet: str) -> str:
+    return re.sub(r"[^0-9a-z]+", "_", sheet.lower()).strip("_") or "sheet"
+def _excel_arrow(df: pd.DataFrame) -> pa.Table:
+    df.columns = [str(c) for c in df.columns]
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # mixed-type object columns (numbers and text in one column): keep them as text
+        for c in df.columns[df.dtypes == object]:
+            df[c] = df[c].map(lambda v: None if pd.isna(v) else str(v))
+        return pa.Table.from_pandas(df, preserve_index=False)
+class ExcelSheets:
+    """Each sheet of EXCEL_PATH converted once to Parquet under EXCEL_CACHE_DIR, reconverted only
+    when the workbook's mtime/size changes (tracked in manifest.json, so it survives restarts)."""
+    def __init__(self, path: str, cache_dir: str):
+        self.path, self.dir = path, cache_dir
+        self.manifest = {}   # {"sig": [...], "sheets": {sheet: {"file": ..., "view": ...}}}
+        self._lock = threading.Lock()
+        self._mount_lock = threading.Lock()
+    def _manifest_path(self) -> str:
+        return os.path.join(self.dir, "manifest.json")
+    def sync(self) -> bool:
+        """Bring the Parquet copies up to date; True when sheets were (re)converted."""
+        st = os.stat(self.path)
+        sig = [st.st_mtime_ns, st.st_size]
+        if self.manifest.get("sig") == sig:
+            return False
+        with self._lock:
+            if not self.manifest:
+                with contextlib.suppress(OSError, ValueError), open(self._manifest_path(), "r", encoding="utf-8") as f:
+                    self.manifest = json.load(f)
+            if self.manifest.get("sig") == sig and all(
+                    os.path.exists(m["file"]) for m in self.manifest.get("sheets", {}).values()):
+                return False
+            os.makedirs(self.dir, exist_ok=True)
+            sheets, used = {}, set()
+            for sheet, df in pd.read_excel(self.path, sheet_name=None).items():
+                # "Sheet 1" and "Sheet-1" share a slug: later ones (workbook order) get _2, _3, ...
+                base = slug = _excel_slug(sheet)
+                n = 1
+                while slug in used:
+                    n += 1
+                    slug = f"{base}_{n}"
+                if slug != base:
+                    print(f"[excel] sheet '{sheet}' collides with another on '{base}'; mounted as excel_{slug}_v")
+                used.add(slug)
+                f = _norm_path(os.path.join(self.dir, f"{slug}.parquet"))
+                pq.write_table(_excel_arrow(df), f + ".tmp")
+                os.replace(f + ".tmp", f)
+                sheets[sheet] = {"file": f, "view": f"excel_{slug}_v"}
+            self.manifest = {"sig": sig, "sheets": sheets}
+            tmp = self._manifest_path() + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.manifest, f)
+            os.replace(tmp, self._manifest_path())
+            print(f"[excel] converted {len(sheets)} sheet(s) from {self.path}")
+            return True
+    def table(self, sheet: str) -> pa.Table | None:
+        self.sync()
+        m = self.manifest["sheets"].get(sheet)
+        return pq.read_table(m["file"]) if m else None
+    def remount(self):
+        """mount_excel_views from a request thread: its own cursor, one remount at a time. Cached
+        results over the old sheets go too (_sources_sig only follows the contract databases)."""
+        with self._mount_lock:
+            con = _duck_cursor()
+            try:
+                mount_excel_views(con)
+            finally:
+                con.close()
+            RESULT_CACHE.purge()
+EXCEL_SHEETS = ExcelSheets(EXCEL_PATH, EXCEL_CACHE_DIR)
+def mount_excel_views(con: duckdb.DuckDBPyConnection | None = None):
+    con = con or DUCK
+    if not os.path.exists(EXCEL_PATH):
+        print(f"[excel] {EXCEL_PATH} not found; no excel views")
+        return
+    EXCEL_SHEETS.sync()
+    sheets = EXCEL_SHEETS.manifest["sheets"]
+    for sheet, m in sheets.items():
+        con.execute(f"CREATE OR REPLACE VIEW {m['view']} AS SELECT * FROM read_parquet('{m['file']}');")
+        print(f"[excel] mounted view {m['view']} (sheet '{sheet}')")
+    # sheets removed from the workbook: drop their views, then the Parquet copies they read
+    views = {m["view"] for m in sheets.values()}
+    for (view,) in con.execute("SELECT view_name FROM duckdb_views() WHERE NOT internal AND schema_name = 'main' "
+                               "AND database_name = current_database() AND view_name LIKE 'excel\\_%\\_v' ESCAPE '\\'").fetchall():
+        if view not in views:
+            con.execute(f"DROP VIEW IF EXISTS {view};")
+            print(f"[excel] dropped view {view} (sheet no longer in the workbook)")
+    files = {_norm_path(m["file"]) for m in sheets.values()}
+    for p in pathlib.Path(EXCEL_SHEETS.dir).glob("*.parquet"):
+        if _norm_path(str(p)) not in files:
+            with contextlib.suppress(OSError):
+                p.unlink()
+# ========= CATALOG (USE_CATALOG=1) =========
+CATALOG_SOURCES = [(DUCK_SERVICES, "svc"), (DUCK_MINISTRY, "cen"), (DUCK_STATE, "sta")]  # aliases the views use
+CATALOG_INFO: dict = {}
+def mount_catalog():
+    """Worker side of build_catalog.py: the views live in the attached catalog and only need the
+    source DuckDBs attached under the aliases they were built with."""
+    for path, alias in CATALOG_SOURCES:
+        if os.path.exists(path):
+            _duck_attach_readonly(DUCK, path, alias)
+        else:
+            print(f"[catalog] {path} not found; views over '{alias}' will fail")
+    CATALOG_INFO.update(dict(DUCK.execute("SELECT key, value FROM catalog.main._catalog_meta").fetchall()))
+    CATALOG_INFO["sig"] = list(_file_sig(CATALOG_DB))
+    if CATALOG_INFO.get("rollups_built_at"):
+        ROLLUPS_CUBE.built_at = CATALOG_INFO["rollups_built_at"]
+        ROLLUPS_CUBE.sig = _sources_sig()
+    n = DUCK.execute("SELECT count(*) FROM duckdb_tables() WHERE database_name = 'catalog'").fetchone()[0] + \
+        DUCK.execute("SELECT count(*) FROM duckdb_views() WHERE database_name = 'catalog' AND NOT internal").fetchone()[0]
+    print(f"[catalog] attached {CATALOG_DB} ({n} objects, built {CATALOG_INFO.get('built_at')})")
 # ========= BOOT =========
-mount_sql_sources()
-mount_json_views()
+MOUNTS = [("catalog", mount_catalog)] if USE_CATALOG else [
+    ("products", mount_products),
+    ("services", mount_services),
+    ("ministry", mount_ministry),
+    ("state", mount_state),
+    ("contracts_all", mount_contracts_all),
+    ("json", mount_json_views),
+    ("excel", mount_excel_views),
+    ("partitions", mount_partition_views),
+]
+MOUNT_TIMINGS: dict[str, float] = {}   # seconds per mount, plus "total"
+MOUNT_ERRORS: dict[str, str] = {}
+BACKGROUND: list[threading.Thread] = []
+def _background(target, name: str):
+    t = threading.Thread(target=target, name=name, daemon=True)
+    BACKGROUND.append(t)
+    t.start()
+def warm_up():
+    t_all = time.perf_counter()
+    for name, fn in MOUNTS:
+        if STOP.is_set():
+            return
+        t0 = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            MOUNT_ERRORS[name] = str(e)
+            print(f"[boot] {name} mount failed: {e}")
+        MOUNT_TIMINGS[name] = round(time.perf_counter() - t0, 3)
+    MOUNT_TIMINGS["total"] = round(time.perf_counter() - t_all, 3)
+    READY.set()
+    print(f"[boot] views ready {MOUNT_TIMINGS}")
+    if REFRESH_SECS > 0:
+        _background(_maintenance_loop, "refresher")
+if LAZY_MOUNT:
+    @app.on_event("startup")
+    def _start_warm_up():
+        _background(warm_up, "warm-up")
+else:
+    warm_up()
+@app.on_event("shutdown")
+def _stop_background():
+    STOP.set()
+    JOB_EXEC.shutdown(wait=False, cancel_futures=True)
+    for j in list(JOBS.values()):
+        j.cancel()
+    SLOW_EXEC.shutdown(wait=True, cancel_futures=True)
+    for t in BACKGROUND:
+        t.join(timeout=30)
 # ========= API =========
+# Liveness: the process is up (views may still be mounting)
 @app.get("/health")
 def health():
     return {"ok": True, "ts": dt.datetime.utcnow().isoformat()}
+# Readiness: every mount has been attempted
+@app.get("/ready")
+def ready():
+    body = {"ok": READY.is_set(), "mounts": MOUNT_TIMINGS, "errors": MOUNT_ERRORS}
+    with contextlib.suppress(OSError, ValueError), open(INDEX_SYNC_STATUS, encoding="utf-8") as f:
+        body["index_sync"] = sync = json.load(f)
+        if sync.get("state") == "failed":
+            body["ok"] = False
+    if USE_CATALOG and CATALOG_INFO:
+        # rebuilt since this worker attached it: restart workers to pick it up
+        stale = os.path.exists(CATALOG_DB) and list(_file_sig(CATALOG_DB)) != CATALOG_INFO["sig"]
+        body["catalog"] = {"path": CATALOG_DB, "built_at": CATALOG_INFO.get("built_at"), "stale": stale}
+    return body if body["ok"] else JSONResponse(body, status_code=503)
 @app.get("/tables")
 def tables():
-    df = DUCK.execute("PRAGMA show_tables;").df()
-    return {"ok": True, "data": df.to_dict(orient="records")}
+    try:
+        with INTERACTIVE.slot(), DUCK_POOL.lease() as cur:
+            df = cur.execute("PRAGMA show_tables;").df()
+        return {"ok": True, "data": df.to_dict(orient="records")}
+    except Exception as e:
+        return _fail(e)
 @app.get("/schema/{view}")
 def schema(view: str):
     try:
-        df = DUCK.execute(f"DESCRIBE {view};").df()
+        with INTERACTIVE.slot(), DUCK_POOL.lease() as cur:
+            df = cur.execute(f"DESCRIBE {view};").df()
         return {"ok": True, "data": df.to_dict(orient="records")}
     except Exception as e:
-        return {"ok": False, "error": str(e)}
+        return _fail(e)
 @app.get("/sample/{view}")
 def sample(view: str, n: int = 20):
+    sql = f"SELECT * FROM {view} LIMIT {int(n)};"
+    def run():
+        with INTERACTIVE.slot(), DUCK_POOL.lease() as cur:
+            return cur.execute(sql).arrow()
     try:
-        df = DUCK.execute(f"SELECT * FROM {view} LIMIT {int(n)};").df()
-        return {"ok": True, "data": df.to_dict(orient="records")}
+        t, hit = _cached("duck", sql, run)
+        return _data(t, cached=hit)
+    except Exception as e:
+        return _fail(e)
+def _bad_format(fmt: str):
+    if fmt != "json" and fmt not in STREAM_MEDIA:
+        return {"ok": False, "error": f"unknown format '{fmt}' (json, {', '.join(STREAM_MEDIA)})"}
+    return None
+# Keyset pages over a contract view, ordered by (contract_date, contract_no, row_sig, occ) NULLS FIRST,
+# then source on views that have one (contracts_all);
+# pass the returned `next` token as `after` for the following page
+@app.get("/page/{view}")
+def page(view: str, n: int = 1000, after: str | None = None):
+    n = min(int(n), MAX_JSON_ROWS) if MAX_JSON_ROWS else int(n)
+    try:
+        with INTERACTIVE.slot(), DUCK_POOL.lease() as cur:
+            types = {r[0]: r[1] for r in cur.execute(f"DESCRIBE {view};").fetchall()}
+            missing = [c for c in KEYSET_COLS if c not in types]
+            if missing:
+                return {"ok": False, "error": f"view '{view}' lacks keyset column(s) {missing}"}
+            keys = KEYSET_COLS + [c for c in ("source",) if c in types]  # contracts_all repeats keys across sources
+            where, params = "", {"n": int(n)}
+            if after:
+                where, key = _keyset_where(keys, types, _keyset_parse(after, keys))
+                params.update(key)
+            sql = f"SELECT * FROM {view} {where} ORDER BY {_keyset_order(keys)} LIMIT $n"
+            _note(sql=sql, scope="duck", params=params)
+            t = cur.execute(sql, params).arrow()
+        t, cut = _capped(t)  # a byte-capped page still continues from its last row
+        rows = _records(t)
+        nxt = _keyset_token(rows[-1], keys) if rows and (len(rows) == int(n) or cut) else None
+        return {"ok": True, "data": rows, "next": nxt, **({"truncated": cut} if cut else {})}
     except Exception as e:
-        return {"ok": False, "error": str(e)}
+        return _fail(e)
+# Change feed: rows added since a watermark. Start with since=<timestamp> (or nothing for the whole
+# view), then pass the returned `next` token as `after`; an empty batch hands back the same token
+@app.get("/changes/{view}")
+def changes(view: str, after: str | None = None, since: str | None = None, n: int = 10000, format: str = "json"):
+    col = CHANGE_VIEWS.get(view)
+    if col is None:
+        return {"ok": False, "error": f"no change feed for '{view}'; use one of {list(CHANGE_VIEWS)}"}
+    if err := _bad_format(format):
+        return err
+    n = max(1, min(int(n), CHANGES_BATCH_MAX))
+    try:
+        after = after or _change_token(since or "0001-01-01", "", 0)
+        with INTERACTIVE.slot(), DUCK_POOL.lease() as cur:
+            wm_type = {r[0]: r[1] for r in cur.execute(f"DESCRIBE {view};").fetchall()}[col]
+            sql, params = _change_sql(view, col, wm_type, after, n)
+            _note(sql=sql, scope="duck", params=params)
+            t = cur.execute(sql, params).arrow()
+        if format != "json":
+            _note(rows=t.num_rows)
+            nxt = _change_token(*(t.column(c)[-1].as_py() for c in (col, "row_sig", "occ"))) if t.num_rows else after
+            return _stream_response(t.to_reader(STREAM_BATCH_ROWS), format,
+                                    headers={"X-Next-Token": nxt, "X-Done": str(t.num_rows < n).lower()})
+        t, cut = _capped(t)
+        rows = _records(t)
+        nxt = _change_token(rows[-1][col], rows[-1]["row_sig"], rows[-1]["occ"]) if rows else after
+        return {"ok": True, "data": rows, "next": nxt, "done": len(rows) < n and not cut,
+                **({"truncated": cut} if cut else {})}
+    except Exception as e:
+        return _fail(e)
+# Named queries: the catalog, then POST /q/{name} {"params": {...}, "format": ...}; results are
+# cached per (name, params) until a source file changes
+@app.get("/q")
+def named_queries():
+    qs = QUERIES.sync()
+    return {"ok": True, "data": [{"name": q["name"], "description": q["description"], "params": q["params"]}
+                                 for q in qs.values()], "error": QUERIES.error}
+@app.post("/q/{name}")
+def named_query(name: str, inp: NamedQIn):
+    if err := _bad_format(inp.format):
+        return err
+    try:
+        q = QUERIES.get(name)
+        bound = QUERIES.bind(q, inp.params)
+        shown = json.loads(json.dumps(bound, default=str))  # dates as ISO strings: cache key, slow log
+        if inp.format != "json":
+            _note(sql=q["sql"], scope=f"q:{name}", params=shown)
+            EXPORT.acquire()
+            try:
+                cur = DUCK_POOL.acquire()
+            except Exception:
+                EXPORT.release()
+                raise
+            def _done():
+                DUCK_POOL.release(cur)
+                EXPORT.release()
+            try:
+                reader = QUERIES.execute(cur, q, bound).fetch_record_batch(STREAM_BATCH_ROWS)
+            except Exception:
+                _done()
+                raise
+            return _stream_response(reader, inp.format, on_close=_done)
+        def run():
+            with INTERACTIVE.slot(), DUCK_POOL.lease() as cur:
+                return QUERIES.execute(cur, q, bound).arrow()
+        t, hit = _cached(f"q:{name}", q["sql"], run, params=shown)
+        return _data(t, cached=hit)
+    except Exception as e:
+        return _fail(e)
+# Server-side cursors: open with SQL, then GET pages until done
+@app.post("/cursor")
+def cursor_open(inp: CursorIn):
+    _sweep_cursors()
+    with _CURSORS_LOCK:
+        if len(CURSORS) >= CURSOR_MAX:
+            return {"ok": False, "error": f"too many open cursors ({CURSOR_MAX}); close some or wait {CURSOR_TTL:g}s"}
+    _note(sql=inp.sql, scope="duck")
+    n = min(inp.n, MAX_JSON_ROWS) if MAX_JSON_ROWS else inp.n
+    try:
+        with INTERACTIVE.slot():
+            c = LiveCursor(inp.sql)
+            rows, done = c.page(n)
+    except Exception as e:
+        return _fail(e)
+    cid = None
+    if done:
+        c.close()
+    else:
+        cid = uuid.uuid4().hex
+        with _CURSORS_LOCK:
+            CURSORS[cid] = c
+    return {"ok": True, "data": rows, "cursor": cid, "done": done}
+@app.get("/cursor/{cid}")
+def cursor_next(cid: str, n: int = 1000):
+    with _CURSORS_LOCK:
+        c = CURSORS.get(cid)
+    if c is None:
+        return {"ok": False, "error": f"cursor '{cid}' not found or expired"}
+    try:
+        with INTERACTIVE.slot():
+            rows, done = c.page(min(n, MAX_JSON_ROWS) if MAX_JSON_ROWS else n)
+    except Exception as e:
+        rows, done, err = None, True, _fail(e)
+    if done:
+        with _CURSORS_LOCK:
+            CURSORS.pop(cid, None)
+        c.close()
+    if rows is None:
+        return err
+    return {"ok": True, "data": rows, "cursor": None if done else cid, "done": done}
+@app.delete("/cursor/{cid}")
+def cursor_close(cid: str):
+    with _CURSORS_LOCK:
+        c = CURSORS.pop(cid, None)
+    if c is not None:
+        c.close()
+    return {"ok": True, "data": {"closed": c is not None}}
+# Async jobs: submit SQL, poll its status, fetch the spooled result (any stream format or json)
+@app.post("/jobs")
+def job_submit(inp: JobIn):
+    if not _CACHEABLE.match(inp.sql):
+        return {"ok": False, "error": "jobs run read queries only (SELECT/WITH/...)"}
+    _sweep_jobs()
+    _await_ready()
+    with _JOBS_LOCK:
+        if len(JOBS) >= JOB_MAX:
+            return _fail(ADMISSION["job"].refuse(f"{JOB_MAX} jobs kept; delete finished ones or wait {JOB_TTL:g}s"))
+        os.makedirs(JOB_SPOOL_DIR, exist_ok=True)
+        job = Job(inp.sql)
+        JOBS[job.id] = job
+    JOB_EXEC.submit(job.run)
+    return {"ok": True, "data": job.info()}
+@app.get("/jobs")
+def job_list():
+    return {"ok": True, "data": [j.info() for j in list(JOBS.values())]}
+@app.get("/jobs/{jid}")
+def job_status(jid: str):
+    job = JOBS.get(jid)
+    if job is None:
+        return {"ok": False, "error": f"job '{jid}' not found or expired"}
+    return {"ok": True, "data": job.info()}
+@app.post("/jobs/{jid}/cancel")
+def job_cancel(jid: str):
+    job = JOBS.get(jid)
+    if job is None:
+        return {"ok": False, "error": f"job '{jid}' not found or expired"}
+    return {"ok": True, "data": {**job.info(), "cancelled": job.cancel()}}
+@app.get("/jobs/{jid}/result")
+def job_result(jid: str, format: str = "parquet"):
+    job = JOBS.get(jid)
+    if job is None:
+        return {"ok": False, "error": f"job '{jid}' not found or expired"}
+    if job.state != "done":
+        return {"ok": False, "error": f"job is {job.state}", "data": job.info()}
+    if err := _bad_format(format):
+        return err
+    try:
+        if format == "parquet":
+            return FileResponse(job.path, media_type=STREAM_MEDIA["parquet"], filename=f"{jid}.parquet")
+        f = pq.ParquetFile(job.path)
+        if format == "json":
+            return _data(f.read())
+        reader = pa.RecordBatchReader.from_batches(f.schema_arrow, f.iter_batches(STREAM_BATCH_ROWS))
+        return _stream_response(reader, format, on_close=f.close)
+    except Exception as e:
+        return _fail(e)
+@app.delete("/jobs/{jid}")
+def job_delete(jid: str):
+    with _JOBS_LOCK:
+        job = JOBS.pop(jid, None)
+    if job is not None:
+        job.cancel()
+        job.remove()
+    return {"ok": True, "data": {"deleted": job is not None}}
 # Ad-hoc SQL on in-memory DUCK
 @app.post("/duck")
 def run_duck(inp: SqlIn):
+    if err := _bad_format(inp.format):
+        return err
     try:
-        df = DUCK.execute(inp.sql).df()
-        return {"ok": True, "data": df.to_dict(orient="records")}
+        if inp.format != "json":
+            # exports hold their cursor until the body is sent, without the query timeout
+            _note(sql=inp.sql, scope="duck")
+            EXPORT.acquire()
+            try:
+                cur = DUCK_POOL.acquire()
+            except Exception:
+                EXPORT.release()
+                raise
+            def _done():
+                DUCK_POOL.release(cur)
+                EXPORT.release()
+            try:
+                reader = cur.execute(inp.sql).fetch_record_batch(STREAM_BATCH_ROWS)
+            except Exception:
+                _done()
+                raise
+            return _stream_response(reader, inp.format, on_close=_done)
+        def run():
+            with INTERACTIVE.slot(), DUCK_POOL.lease() as cur:
+                return cur.execute(inp.sql).arrow()
+        t, hit = _cached("duck", inp.sql, run)
+        if not _CACHEABLE.match(inp.sql):
+            RESULT_CACHE.purge()  # DDL may have redefined views behind cached results
+        return _data(t, cached=hit)
     except Exception as e:
-        return {"ok": False, "error": str(e)}
+        return _fail(e)
 # Named DB runners
 @app.post("/duck2")
 def run_duck_named(inp: SqlNamedIn):
-    path = {"services": DUCK_SERVICES, "ministry": DUCK_MINISTRY, "state": DUCK_STATE}.get(inp.db)
+    path = NAMED_DUCK.get(inp.db)
     if not path or not os.path.exists(path):
         return {"ok": False, "error": f"unknown duckdb '{inp.db}'"}
+    if err := _bad_format(inp.format):
+        return err
+    pool = NAMED_POOLS[inp.db]
     try:
-        con = duckdb.connect(path, read_only=True)
-        df = con.execute(inp.sql).df()
-        con.close()
-        return {"ok": True, "data": df.to_dict(orient="records")}
+        if inp.format != "json":
+            _note(sql=inp.sql, scope=f"duck2:{inp.db}")
+            EXPORT.acquire()
+            try:
+                con = pool.acquire()
+            except Exception:
+                EXPORT.release()
+                raise
+            def _done():
+                pool.release(con)
+                EXPORT.release()
+            try:
+                reader = con.execute(inp.sql).fetch_record_batch(STREAM_BATCH_ROWS)
+            except Exception:
+                _done()
+                raise
+            return _stream_response(reader, inp.format, on_close=_done)
+        def run():
+            with INTERACTIVE.slot(), pool.lease() as con:
+                return con.execute(inp.sql).arrow()
+        t, hit = _cached(f"duck2:{inp.db}", inp.sql, run)
+        return _data(t, cached=hit)
     except Exception as e:
-        return {"ok": False, "error": str(e)}
+        return _fail(e)
 @app.post("/sqlite2")
 def run_sqlite_named(inp: SqlNamedIn):
     if inp.db != "products" or not os.path.exists(SQLITE_PRODUCTS):
         return {"ok": False, "error": "unknown sqlite 'products'"}
+    if err := _bad_format(inp.format):
+        return err
+    pool = NAMED_POOLS["products"]
     try:
-        con = sqlite3.connect(SQLITE_PRODUCTS)
-        df = pd.read_sql_query(inp.sql, con)
-        con.close()
-        return {"ok": True, "data": df.to_dict(orient="records")}
+        if inp.format != "json":
+            _note(sql=inp.sql, scope="sqlite2:products")
+            EXPORT.acquire()
+            try:
+                con = pool.acquire()
+            except Exception:
+                EXPORT.release()
+                raise
+            cur = None
+            def _done():
+                if cur is not None:
+                    cur.close()
+                pool.release(con)
+                EXPORT.release()
+            try:
+                cur = con.execute(inp.sql)
+                reader = _sqlite_reader(cur)
+            except Exception:
+                _done()
+                raise
+            return _stream_response(reader, inp.format, on_close=_done)
+        def run():
+            with INTERACTIVE.slot(), pool.lease() as con:
+                cur = con.execute(inp.sql)
+                try:
+                    return _sqlite_reader(cur).read_all()
+                finally:
+                    cur.close()
+        t, hit = _cached("sqlite2:products", inp.sql, run)
+        return _data(t, cached=hit)
     except Exception as e:
-        return {"ok": False, "error": str(e)}
+        return _fail(e)
+# Rollups: GROUP BY any of ROLLUP_DIMS with equality filters, answered from rollup_contracts
+@app.post("/rollup")
+def rollup(inp: RollupIn):
+    bad = [d for d in [*inp.group_by, *inp.filters] if d not in ROLLUP_DIMS]
+    if bad:
+        return {"ok": False, "error": f"unknown rollup dimension(s) {bad}; use {ROLLUP_DIMS}"}
+    if not ROLLUPS:
+        return {"ok": False, "error": "rollups disabled (ROLLUPS=0)"}
+    try:
+        where, params = [], {}
+        for i, (dim, val) in enumerate(inp.filters.items()):
+            vals = val if isinstance(val, list) else [val]
+            names = [f"f{i}_{j}" for j in range(len(vals))]
+            where.append(f"{dim} IN ({', '.join('$' + n for n in names)})")
+            params.update(zip(names, vals))
+        if inp.month_from:
+            where.append("month >= CAST($month_from AS DATE)"); params["month_from"] = inp.month_from
+        if inp.month_to:
+            where.append("month <= CAST($month_to AS DATE)"); params["month_to"] = inp.month_to
+        dims = ", ".join(inp.group_by)
+        sql = (f"SELECT {dims + ', ' if dims else ''}sum(total) AS total, "
+               f"CAST(sum(contracts) AS BIGINT) AS contracts, sum(quantity) AS quantity "
+               f"FROM rollup_contracts{' WHERE ' + ' AND '.join(where) if where else ''}"
+               f"{' GROUP BY ' + dims + ' ORDER BY ' + dims if dims else ''}")
+        _note(sql=sql, scope="duck", params=params)
+        with INTERACTIVE.slot():
+            if ROLLUPS_CUBE.built_at is None:
+                ROLLUPS_CUBE.refresh()
+            with DUCK_POOL.lease() as cur:
+                t = cur.execute(sql, params).arrow()
+        return _data(t, built_at=ROLLUPS_CUBE.built_at)
+    except Exception as e:
+        return _fail(e)
+# Products snapshot
+@app.post("/admin/products/refresh")
+def products_refresh(full: bool = False):
+    if USE_CATALOG:
+        return {"ok": False, "error": "serving from CATALOG_DB; rerun build_catalog.py and restart the workers"}
+    try:
+        return {"ok": True, "data": PRODUCTS_SNAPSHOT.refresh(full=full)}
+    except Exception as e:
+        return _fail(e)
+# Partitioned Parquet export (view=products|services|ministry|state, default all)
+@app.post("/admin/partitions/refresh")
+def partitions_refresh(view: str | None = None, full: bool = False):
+    if USE_CATALOG:
+        return {"ok": False, "error": "serving from CATALOG_DB; run export_partitions.py, rebuild the catalog and restart the workers"}
+    try:
+        return {"ok": True, "data": PARTITIONS.refresh([view] if view else None, full=full)}
+    except Exception as e:
+        return _fail(e)
+# Result cache
+@app.get("/cache/stats")
+def cache_stats():
+    return {"ok": True, "data": RESULT_CACHE.stats()}
+@app.post("/cache/purge")
+def cache_purge():
+    return {"ok": True, "data": {"purged": RESULT_CACHE.purge()}}
+# Resource governor: admission per class (running, queued, admitted, rejected) and the DuckDB limits
+@app.get("/admission")
+def admission_stats():
+    with contextlib.closing(_duck_cursor()) as cur:
+        limits = cur.execute("""SELECT name, value FROM duckdb_settings()
+                                WHERE name IN ('memory_limit', 'threads', 'temp_directory', 'max_temp_directory_size')""").fetchall()
+    return {"ok": True, "data": {"classes": [a.stats() for a in ADMISSION.values()], "duck": dict(limits),
+                                 "duck2": {"per_file": DUCK2_LIMITS, "files": len(NAMED_DUCK)},
+                                 "max_json_rows": MAX_JSON_ROWS, "max_json_bytes": MAX_JSON_BYTES}}
+# Prometheus text exposition (format 0.0.4)
+@app.get("/metrics")
+def metrics():
+    lines = []
+    for m in METRICS:
+        lines += m.render()
+    cache = RESULT_CACHE.stats()
+    gauges = [("dataexec_ready", "1 once every view is mounted.", int(READY.is_set())),
+              ("dataexec_result_cache_bytes", "Bytes held by the result cache.", cache["bytes"]),
+              ("dataexec_result_cache_entries", "Results held by the result cache.", cache["entries"]),
+              ("dataexec_open_cursors", "Server-side cursors open.", len(CURSORS)),
+              ("dataexec_jobs_running", "Async query jobs running.", sum(j.state == "running" for j in list(JOBS.values()))),
+              ("dataexec_jobs_queued", "Async query jobs waiting for a worker.", sum(j.state == "queued" for j in list(JOBS.values())))]
+    for name, help, v in gauges:
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {v}"]
+    for kind, help in (("running", "Requests holding an admission slot."), ("queued", "Requests waiting for one.")):
+        lines += [f"# HELP dataexec_admission_{kind} {help}", f"# TYPE dataexec_admission_{kind} gauge"]
+        lines += [f'dataexec_admission_{kind}{{class="{a.name}"}} {getattr(a, kind)}' for a in ADMISSION.values()]
+    lines += ["# HELP dataexec_mount_seconds Seconds spent mounting each source at boot.",
+              "# TYPE dataexec_mount_seconds gauge"]
+    lines += [f'dataexec_mount_seconds{{mount="{k}"}} {v}' for k, v in MOUNT_TIMINGS.items()]
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
 # JSON helpers
 @app.get("/json/list")
 def list_json():
     try:
-        files = sorted([p.name for p in pathlib.Path(JSON_DIR).glob("*.json")])
-        return {"ok": True, "data": files}
+        return {"ok": True, "data": JSON_DOCS.names()}
     except Exception as e:
-        return {"ok": False, "error": str(e)}
+        return _fail(e)
 def _deep_get(obj, dotted):
     cur = obj
     for part in dotted.split("."):
@@ -480,34 +2577,173 @@ def get_json(inp: JsonGetIn):
     p = pathlib.Path(JSON_DIR, f"{inp.name}.json")
     if not p.exists():
         return {"ok": False, "error": f"json '{inp.name}' not found in {JSON_DIR}"}
-    data = json.load(open(p, "r", encoding="utf-8"))
-    if inp.key:
-        data = _deep_get(data, inp.key)
-    return {"ok": True, "data": data}
-# Excel passthrough
+    data = JSON_DOCS.lookup(inp.name, inp.key) if inp.key else JSON_DOCS.data(inp.name)
+    # parsed JSON is already encodable, so skip FastAPI's per-node jsonable_encoder walk
+    return JSONResponse({"ok": True, "data": data})
+# Excel passthrough (served from the Parquet copy of each sheet)
 @app.post("/excel")
 def load_excel(inp: ExcelIn):
-    df = pd.read_excel(EXCEL_PATH, sheet_name=inp.sheet)
-    return {"ok": True, "data": df.to_dict(orient="records")}
+    try:
+        if EXCEL_SHEETS.sync() and READY.is_set():
+            EXCEL_SHEETS.remount()  # sheets may have been added or renamed
+        t = EXCEL_SHEETS.table(inp.sheet)
+    except Exception as e:
+        return _fail(e)
+    if t is None:
+        return {"ok": False, "error": f"sheet '{inp.sheet}' not found in {EXCEL_PATH}"}
+    return _data(t)
+# Contract search: ranked text match on product/service names and brands, narrowed by filters
+@app.post("/contracts/search")
+def contracts_search(inp: ContractQIn):
+    if CONTRACT_INDEX.current() is None:
+        return {"ok": False, "error": f"contract index not built yet ({CONTRACT_FTS_DB}); see CONTRACT_FTS"}
+    filters = [(col, "=", v) for col, v in (("source", inp.source), ("ministry", inp.ministry), ("state", inp.state)) if v]
+    filters += [(col, op, v) for col, op, v in (("contract_date", ">=", inp.date_from), ("contract_date", "<=", inp.date_to),
+                                                ("total", ">=", inp.min_total), ("total", "<=", inp.max_total)) if v is not None]
+    try:
+        t0 = time.perf_counter()
+        with INTERACTIVE.slot():
+            hits = CONTRACT_INDEX.search(inp.q, inp.k, inp.match, filters)
+        _note(rows=len(hits))
+        return {"ok": True, "data": hits, "latency_ms": round((time.perf_counter() - t0) * 1000, 2)}
+    except Exception as e:
+        return _fail(e)
 # BM25 (optional)
-def bm25_search(dbfile, q, k):
-    con = sqlite3.connect(dbfile)
-    rows = con.execute("""
-      SELECT d.id, d.path, d.title,
-             snippet(docs_fts, 0, '[', ']', '...', 12) AS snip
-      FROM docs_fts
-      JOIN docs d ON d.id = docs_fts.rowid
-      WHERE docs_fts MATCH ?
-      ORDER BY rank LIMIT ?;
-    """, (q, k)).fetchall()
-    con.close()
-    return [{"id": r[0], "path": r[1], "title": r[2], "snippet": r[3]} for r in rows]
+BM25_EXEC = ThreadPoolExecutor(max_workers=len(BM25_DB), thread_name_prefix="bm25")
+# index -> (file sig, has title column, compact storage); files not yet migrated by index_builder
+# are body-only, compact ones (INDEX_STORAGE=compact) hold zlib bodies behind a contentless FTS
+_BM25_LAYOUT = {}
+def _bm25_layout(index, con) -> tuple[bool, bool]:
+    sig = _file_sig(BM25_DB[index])
+    hit = _BM25_LAYOUT.get(index)
+    if hit is None or hit[0] != sig:
+        titled = con.execute("SELECT count(*) FROM pragma_table_info('docs_fts') WHERE name = 'title'").fetchone()[0] > 0
+        compact = (con.execute("SELECT 1 FROM sqlite_master WHERE name = 'meta'").fetchone() is not None and
+                   con.execute("SELECT value FROM meta WHERE key = 'storage'").fetchone() == ("compact",))
+        _BM25_LAYOUT[index] = hit = (sig, titled, compact)
+    return hit[1], hit[2]
+_FTS_OPS = {"AND", "OR", "NOT", "NEAR"}
+_FTS_TOKEN = re.compile(r"[^\W_]+")  # what FTS5's unicode61 tokenizer calls a word
+def _fts_terms(q: str) -> list[tuple[str, bool]]:
+    """(lowercased word, is prefix) for each word of an FTS5 query, operators aside."""
+    return [(m.group(0).lower(), q[m.end():m.end() + 1] == "*") for m in _FTS_TOKEN.finditer(q)
+            if m.group(0) not in _FTS_OPS]
+def _mark(text: str, terms, width: int = 0) -> str:
+    """snippet()/highlight() for contentless indexes: query words in [ ]; with `width`, only the
+    window of that many tokens holding the most of them, elided with ..."""
+    toks = list(_FTS_TOKEN.finditer(text or ""))
+    if not toks:
+        return ""
+    hit = [any(t.group(0).lower().startswith(w) if pre else t.group(0).lower() == w for w, pre in terms) for t in toks]
+    lo, hi = 0, len(toks)
+    if width and len(toks) > width:
+        pos = [i for i, h in enumerate(hit) if h]
+        best = max(range(len(pos)), key=lambda i: bisect.bisect_left(pos, pos[i] + width) - i, default=None)
+        lo = min(pos[best], len(toks) - width) if best is not None else 0
+        hi = lo + width
+    out, at = ["..." if lo else ""], toks[lo].start()
+    for t, h in zip(toks[lo:hi], hit[lo:hi]):
+        out += [text[at:t.start()], f"[{t.group(0)}]" if h else t.group(0)]
+        at = t.end()
+    out.append(text[at:] if hi == len(toks) else "...")
+    return "".join(out)
+def bm25_search(index, q, k):
+    with BM25_POOLS[index].lease() as con:
+        titled, compact = _bm25_layout(index, con)
+        # rank is bm25() with the title weight index_builder stored in the index
+        snip = "d.body" if compact else f"snippet(docs_fts, {1 if titled else 0}, '[', ']', '...', 12)"
+        rows = con.execute(f"""
+          SELECT d.id, d.path, d.title, {snip} AS snip, -rank AS score
+          FROM docs_fts
+          JOIN docs d ON d.id = docs_fts.rowid
+          WHERE docs_fts MATCH ?
+          ORDER BY rank LIMIT ?;
+        """, (q, k)).fetchall()
+    if compact:  # only the k bodies shown are decompressed
+        terms = _fts_terms(q)
+        rows = [(*r[:3], _mark(zlib.decompress(r[3]).decode("utf-8"), terms, 12), r[4]) for r in rows]
+    return [{"id": r[0], "path": r[1], "title": r[2], "snippet": r[3], "score": r[4]} for r in rows]
+def _timed_search(index, q, k):
+    t0 = time.perf_counter()
+    hits = bm25_search(index, q, k)
+    return hits, round((time.perf_counter() - t0) * 1000, 2)
+def bm25_suggest(index, q, k):
+    """Titles completing q: earlier words must match whole, the last one as a prefix."""
+    words = _FTS_TOKEN.findall(q)
+    if not words:
+        return []
+    with BM25_POOLS[index].lease() as con:
+        if not _bm25_layout(index, con)[0]:
+            raise RuntimeError(f"{index} index has no title column yet; rerun startup.py to migrate it")
+        # quoted, so user text never reaches the FTS5 query syntax; 'ab'* is served by prefix='2 3 4'
+        expr = "title : (" + " ".join(f'"{w}"' for w in words[:-1]) + f' "{words[-1]}"*)'
+        rows = con.execute("""
+          SELECT d.id, d.path, d.title
+          FROM docs_fts
+          JOIN docs d ON d.id = docs_fts.rowid
+          WHERE docs_fts MATCH ?
+          ORDER BY rank LIMIT ?;
+        """, (expr, k)).fetchall()
+    # highlighted here rather than by highlight(), which compact (contentless) indexes cannot run
+    terms = [(w.lower(), False) for w in words[:-1]] + [(words[-1].lower(), True)]
+    return [{"id": r[0], "path": r[1], "title": r[2], "highlight": _mark(r[2], terms)} for r in rows]
+@app.post("/bm25/suggest")
+def suggest(inp: SuggestIn):
+    try:
+        t0 = time.perf_counter()
+        db = BM25_DB.get(inp.index)
+        if not db:
+            return {"ok": False, "error": "unknown index"}
+        if not os.path.exists(db):
+            return {"ok": False, "error": f"index db not found: {db}"}
+        with INTERACTIVE.slot():
+            hits = bm25_suggest(inp.index, inp.q, inp.k)
+        _note(rows=len(hits))
+        return {"ok": True, "data": hits, "latency_ms": round((time.perf_counter() - t0) * 1000, 2)}
+    except Exception as e:
+        return _fail(e)
 @app.post("/bm25")
 def search(inp: QIn):
-    db = BM25_DB.get(inp.index)
-    if not db:
-        return {"ok": False, "error": "unknown index"}
-    if not os.path.exists(db):
-        return {"ok": False, "error": f"index db not found: {db}"}
-    hits = bm25_search(db, inp.q, inp.k)
-    return {"ok": True, "data": hits, "cite": [{"id": h["id"], "path": h["path"]} for h in hits]}
+    if isinstance(inp.index, str) and inp.index != "all":
+        db = BM25_DB.get(inp.index)
+        if not db:
+            return {"ok": False, "error": "unknown index"}
+        if not os.path.exists(db):
+            return {"ok": False, "error": f"index db not found: {db}"}
+        try:
+            with INTERACTIVE.slot():
+                hits, ms = _timed_search(inp.index, inp.q, inp.k)
+        except Exception as e:
+            return _fail(e)  # e.g. FTS5 syntax
+        _note(rows=len(hits))
+        return {"ok": True, "data": hits, "cite": [{"id": h["id"], "path": h["path"]} for h in hits],
+                "latency_ms": {inp.index: ms}}
+    # federated: query every index in parallel, merge on score normalized per index (best hit = 1)
+    names = list(BM25_DB) if inp.index == "all" else inp.index
+    unknown = [n for n in names if n not in BM25_DB]
+    if unknown:
+        return {"ok": False, "error": f"unknown index {unknown}"}
+    try:
+        INTERACTIVE.acquire()  # one slot for the whole fan-out
+    except Exception as e:
+        return _fail(e)
+    try:
+        futures = {n: BM25_EXEC.submit(_timed_search, n, inp.q, inp.k)
+                   for n in names if os.path.exists(BM25_DB[n])}
+        merged, latency, errors = [], {}, {n: "index db not found" for n in names if n not in futures}
+        for n, fut in futures.items():
+            try:
+                hits, latency[n] = fut.result()
+            except Exception as e:
+                errors[n] = str(e)
+                continue
+            top = max((h["score"] for h in hits), default=0) or 1.0
+            merged += [{**h, "index": n, "norm_score": h["score"] / top} for h in hits]
+    finally:
+        INTERACTIVE.release()
+    merged.sort(key=lambda h: h["norm_score"], reverse=True)
+    hits = merged[:inp.k]
+    _note(rows=len(hits))
+    return {"ok": True, "data": hits,
+            "cite": [{"index": h["index"], "id": h["id"], "path": h["path"]} for h in hits],
+            "latency_ms": latency, "errors": errors}
@@ -0,0 +1 @@
+# bench: synthetic data (bench.gen) and a load driver for the app (bench.run)
@@ -0,0 +1,207 @@
+# bench/gen.py
+"""Synthetic data for benchmarks, laid out the way app.py expects it:
+
+    <out>/tm_dedup.db                      tenders (products, SQLite)
+    <out>/{services,ministry,state}.duckdb contracts_raw
+    <out>/*.json                           the eight metadata files
+    <out>/docs/gem_categories.xlsx
+    <out>/corpus/{texts,ppt,media_txt}     BM25 sources, indexed into <out>/indices
+    <out>/bench_env.json                   env vars pointing the app at all of the above
+
+Same --seed and --scale give the same data.
+
+    python -m bench.gen --out /tmp/tm-bench --scale 1
+"""
+import os, sys, json, random, sqlite3, argparse, datetime as dt
+import duckdb, pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from index_builder import walk_and_index
+
+# rows/files at --scale 1
+BASE = {"tenders": 50_000, "contracts": 30_000, "texts": 2_000, "ppt": 50, "media": 500}
+MINISTRIES = [f"Ministry of {w}" for w in ("Defence", "Railways", "Health", "Education", "Power", "Finance",
+                                            "Agriculture", "Home Affairs", "Textiles", "Coal")]
+STATES = [("KA", "Karnataka", "South"), ("MH", "Maharashtra", "West"), ("UP", "Uttar Pradesh", "North"),
+          ("WB", "West Bengal", "East"), ("TN", "Tamil Nadu", "South"), ("GJ", "Gujarat", "West")]
+DEPARTMENTS = [f"Department {c}" for c in "ABCDEFGH"]
+PRODUCTS = ["laptop", "desktop", "printer", "toner", "chair", "table", "ups", "monitor", "scanner", "projector",
+            "router", "switch", "cable", "air conditioner", "water cooler", "generator"]
+BRANDS = ["dell", "hp", "lenovo", "acer", "godrej", "apc", "cisco", "samsung", "lg", "canon"]
+SERVICES = ["manpower outsourcing", "security services", "cab hiring", "cleaning", "catering",
+            "facility management", "event management", "audit services"]
+WORDS = ("tender contract bid procurement supply delivery invoice payment warranty inspection vendor "
+         "quantity price rate quotation approval budget ministry department state portal category "
+         "service product order award evaluation technical financial compliance schedule").split()
+
+def _date(rng, start=dt.date(2022, 1, 1), days=1000):
+    return start + dt.timedelta(days=rng.randrange(days))
+
+def gen_tenders(path, n, rng):
+    if os.path.exists(path):
+        os.remove(path)
+    con = sqlite3.connect(path)
+    # TEXT amounts with thousands separators, as the scraper stores them
+    con.execute("""CREATE TABLE tenders (s_no INTEGER, contract_no TEXT, status_of_contract TEXT,
+        organization_type TEXT, ministry TEXT, department TEXT, organization_name TEXT, office_zone TEXT,
+        buyer_designation TEXT, buying_mode TEXT, bid_number TEXT, contract_date TEXT, total TEXT,
+        item_desc TEXT, brand TEXT, model TEXT, qty TEXT, price TEXT, unit_price TEXT, row_sig TEXT,
+        occ INTEGER, source_file TEXT, ingested_at TEXT)""")
+    t0 = dt.datetime(2024, 1, 1)
+    def rows():
+        for i in range(n):
+            qty, unit = rng.randint(1, 500), rng.randint(100, 200_000)
+            yield (i, f"GEMC-{i:09d}", rng.choice(["Completed", "Ongoing", "Cancelled"]),
+                   rng.choice(["Central", "State", "PSU"]), rng.choice(MINISTRIES), rng.choice(DEPARTMENTS),
+                   f"Organisation {rng.randrange(400)}", rng.choice(["North", "South", "East", "West"]),
+                   "Purchase Officer", rng.choice(["Direct Purchase", "L1", "Bid", "RA"]), f"GEM/2024/B/{i}",
+                   _date(rng).isoformat(), f"{qty * unit:,}",
+                   f"{rng.choice(PRODUCTS)} {rng.choice(BRANDS)} {rng.randrange(1000)}", rng.choice(BRANDS),
+                   f"M{rng.randrange(100)}", f"{qty:,}", f"{qty * unit:,}", f"{unit:,}", f"sig-p-{i}", 1,
+                   f"tenders_{i // 10_000}.csv", (t0 + dt.timedelta(seconds=i)).isoformat())
+    with con:
+        con.executemany(f"INSERT INTO tenders VALUES ({','.join('?' * 23)})", rows())
+    con.close()
+
+def gen_contracts(path, n, kind, seed):
+    if os.path.exists(path):
+        os.remove(path)
+    org_col = "state" if kind == "state" else "ministry"
+    orgs = [s[1] for s in STATES] if kind == "state" else MINISTRIES
+    con = duckdb.connect(path)
+    # hash(range, seed) spreads values deterministically without a Python row loop; the seed is hashed
+    # in, not added (range + seed would make the seeds row-shifted copies with the same aggregates)
+    con.execute(f"""CREATE TABLE contracts_raw AS
+      WITH r AS (SELECT range AS i, (hash(range, {seed}) % 1000000007)::BIGINT AS h FROM range({int(n)}))
+      SELECT i AS s_no, '{kind[:3].upper()}C-' || lpad(i::VARCHAR, 9, '0') AS contract_no,
+        (['Completed','Ongoing','Cancelled'])[1 + h % 3] AS status,
+        (['Central','State','PSU'])[1 + h % 3] AS organization_type,
+        ($orgs)[1 + (h // 7) % {len(orgs)}] AS {org_col},
+        ($deps)[1 + (h // 11) % {len(DEPARTMENTS)}] AS department,
+        'Organisation ' || (h // 13) % 400 AS organization_name,
+        (['North','South','East','West'])[1 + (h // 17) % 4] AS office_zone,
+        'Purchase Officer' AS buyer_designation,
+        (['Direct Purchase','L1','Bid','RA'])[1 + (h // 19) % 4] AS buying_mode,
+        'GEM/2024/B/' || i AS bid_number,
+        DATE '2022-01-01' + ((h // 23) % 1000)::INT AS contract_date,
+        ((h // 29) % 5000000) / 10.0 AS total,
+        ($products)[1 + (h // 31) % {len(PRODUCTS)}] || ' ' || (h // 37) % 1000 AS product_name,
+        ($brands)[1 + (h // 41) % {len(BRANDS)}] AS product_brand,
+        'M' || (h // 43) % 100 AS product_model,
+        ($services)[1 + (h // 47) % {len(SERVICES)}] AS service_name,
+        'Category ' || (h // 53) % 40 AS service_category,
+        1 + (h // 59) % 500 AS ordered_quantity,
+        ((h // 61) % 200000)::DOUBLE AS price,
+        ((h // 67) % 200000)::DOUBLE AS unit_price,
+        'sig-{kind}-' || i AS row_sig, 1 AS occ, 'contracts_' || i // 10000 || '.csv' AS source_file,
+        TIMESTAMP '2024-01-01' + to_seconds(i) AS imported_at
+      FROM r""", {"orgs": orgs, "deps": DEPARTMENTS, "products": PRODUCTS, "brands": BRANDS, "services": SERVICES})
+    con.close()
+
+def gen_json(out, rng):
+    docs = {
+        "central_portals": {"portals": [{"portal_id": i, "name": f"Central Portal {i}", "url": f"https://portal{i}.example",
+                                         "org_scope": "central", "notes": None} for i in range(20)]},
+        "state_portals": {"portals": [{"portal_id": i, "name": f"{s[1]} Portal", "state_code": s[0],
+                                       "url": f"https://{s[0].lower()}.example", "notes": None} for i, s in enumerate(STATES)]},
+        "ministry_metadata": {"ministries": [{"ministry": m, "abbr": "".join(w[0] for w in m.split()), "notes": None}
+                                             for m in MINISTRIES]},
+        "states_metadata": {"states": [{"state_code": c, "state_name": n, "zone": z} for c, n, z in STATES]},
+        "ministry_hierarchy": {"tree": [{"ministry": m, "departments": [{"department": d} for d in rng.sample(DEPARTMENTS, 4)]}
+                                        for m in MINISTRIES]},
+        "states_hierarchy": {"tree": [{"state_code": c, "state_name": n,
+                                       "top_departments": [{"department": d} for d in rng.sample(DEPARTMENTS, 3)]}
+                                      for c, n, _ in STATES]},
+        "product_categories_metadata": {"categories": [
+            {"category_id": i, "name": f"{p} category", "slug": p.replace(" ", "-"), "rows_count": rng.randrange(10**6),
+             "available": {"min": "2022-01-01", "max": "2024-12-31"}, "updated_at": "2024-12-31"}
+            for i, p in enumerate(PRODUCTS * 25)]},
+        "service_categories_metadata": {"categories": [
+            {"service_category_id": i, "name": f"{s} category", "slug": s.replace(" ", "-"), "rows_count": rng.randrange(10**5),
+             "available": {"min": "2022-01-01", "max": "2024-12-31"}, "updated_at": "2024-12-31"}
+            for i, s in enumerate(SERVICES * 25)]},
+    }
+    for name, doc in docs.items():
+        with open(os.path.join(out, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=1)
+
+def gen_excel(path, rng):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with pd.ExcelWriter(path) as w:
+        pd.DataFrame({"category_id": range(len(PRODUCTS) * 50),
+                      "category": [f"{p} {i}" for i in range(50) for p in PRODUCTS],
+                      "gst_pct": [rng.choice([5, 12, 18, 28]) for _ in range(len(PRODUCTS) * 50)]}
+                     ).to_excel(w, sheet_name="Sheet1", index=False)
+        pd.DataFrame({"service": SERVICES, "sla_days": [rng.randint(1, 30) for _ in SERVICES]}
+                     ).to_excel(w, sheet_name="Services", index=False)
+
+def _text(rng, words):
+    return " ".join(rng.choice(WORDS + PRODUCTS + BRANDS) for _ in range(words))
+
+def gen_corpus(root, n_text, n_ppt, n_media, rng):
+    dirs = {k: os.path.join(root, k) for k in ("texts", "ppt", "media_txt")}
+    for d in dirs.values():
+        os.makedirs(d, exist_ok=True)
+    for i in range(n_text):
+        with open(os.path.join(dirs["texts"], f"doc_{i:06d}.txt"), "w", encoding="utf-8") as f:
+            f.write(_text(rng, rng.randint(150, 1500)))
+    for i in range(n_media):
+        with open(os.path.join(dirs["media_txt"], f"talk_{i:05d}.vtt"), "w", encoding="utf-8") as f:
+            f.write("WEBVTT\n\n" + "\n\n".join(f"00:{m:02d}:00.000 --> 00:{m:02d}:59.000\n{_text(rng, 40)}"
+                                                 for m in range(rng.randint(5, 30))))
+    try:
+        from pptx import Presentation
+    except ImportError:
+        print("[gen] python-pptx not installed; no ppt corpus")
+        return dirs
+    for i in range(n_ppt):
+        prs = Presentation()
+        for _ in range(rng.randint(5, 20)):
+            slide = prs.slides.add_slide(prs.slide_layouts[1])
+            slide.shapes.title.text = _text(rng, 5)
+            slide.placeholders[1].text = _text(rng, 80)
+        prs.save(os.path.join(dirs["ppt"], f"deck_{i:04d}.pptx"))
+    return dirs
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Generate synthetic data-exec sources for benchmarks")
+    ap.add_argument("--out", required=True, help="output directory (becomes DATA_ROOT)")
+    ap.add_argument("--scale", type=float, default=1.0, help=f"multiplier on {BASE}")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--skip-corpus", action="store_true", help="no text/pptx corpora or BM25 indexes")
+    args = ap.parse_args(argv)
+    out = os.path.abspath(args.out)
+    os.makedirs(out, exist_ok=True)
+    n = {k: max(1, int(v * args.scale)) for k, v in BASE.items()}
+    rng = random.Random(args.seed)
+    steps = [("tenders", lambda: gen_tenders(os.path.join(out, "tm_dedup.db"), n["tenders"], rng))]
+    steps += [(kind, lambda kind=kind, i=i: gen_contracts(os.path.join(out, f"{kind}.duckdb"), n["contracts"], kind, args.seed + i))
+              for i, kind in enumerate(("services", "ministry", "state"))]
+    steps += [("json", lambda: gen_json(out, rng)),
+              ("excel", lambda: gen_excel(os.path.join(out, "docs", "gem_categories.xlsx"), rng))]
+    if not args.skip_corpus:
+        def corpus():
+            dirs = gen_corpus(os.path.join(out, "corpus"), n["texts"], n["ppt"], n["media"], rng)
+            os.makedirs(os.path.join(out, "indices"), exist_ok=True)
+            for kind, sub in (("text", "texts"), ("ppt", "ppt"), ("media", "media_txt")):
+                db = os.path.join(out, "indices", f"{kind}_bm25.sqlite")
+                if os.path.exists(db):
+                    os.remove(db)
+                walk_and_index(db, dirs[sub], kind=kind)
+        steps.append(("corpus", corpus))
+    for name, fn in steps:
+        t0 = dt.datetime.now()
+        fn()
+        print(f"[gen] {name} in {(dt.datetime.now() - t0).total_seconds():.1f}s")
+    env = {"DATA_ROOT": out, "JSON_DIR": out,
+           "SQLITE_PRODUCTS": os.path.join(out, "tm_dedup.db"),
+           "DUCK_SERVICES": os.path.join(out, "services.duckdb"),
+           "DUCK_MINISTRY": os.path.join(out, "ministry.duckdb"),
+           "DUCK_STATE": os.path.join(out, "state.duckdb"),
+           "EXCEL_PATH": os.path.join(out, "docs", "gem_categories.xlsx")}
+    with open(os.path.join(out, "bench_env.json"), "w", encoding="utf-8") as f:
+        json.dump({"env": env, "scale": args.scale, "seed": args.seed, "rows": n}, f, indent=1)
+    print(f"[gen] wrote {out} ({n})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# bench/run.py
+"""Drive the app with concurrent clients and report throughput and latency percentiles as JSON.
+
+In-process (the real app behind Starlette's TestClient, pointed at a bench.gen data dir):
+
+    python -m bench.run --data /tmp/tm-bench --clients 8 --seconds 30 --out base.json
+
+Against a running server (same data must be behind it):
+
+    python -m bench.run --url http://127.0.0.1:8008 --clients 8 --seconds 30 --out new.json
+
+Compare with an earlier run; exits 1 when any p95 regressed by more than --tolerance percent:
+
+    python -m bench.run --data /tmp/tm-bench --out new.json --compare base.json
+
+Needs httpx (pip install httpx); the app itself does not.
+"""
+import os, sys, json, math, time, random, argparse, threading, platform, datetime as dt
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> (weight, method, path, json body); weights set the request mix
+SCENARIOS = {
+    "duck_group_by":  (3, "POST", "/duck", {"sql": "SELECT source, ministry, count(*) AS n, sum(total) AS total "
+                                                   "FROM contracts_all GROUP BY ALL ORDER BY total DESC LIMIT 50"}),
+    "duck_filter":    (3, "POST", "/duck", {"sql": "SELECT contract_no, contract_date, total FROM products "
+                                                   "WHERE product_name LIKE 'laptop%' ORDER BY total DESC LIMIT 100"}),
+    "duck_month":     (2, "POST", "/duck", {"sql": "SELECT date_trunc('month', contract_date) AS month, count(*) AS n "
+                                                   "FROM services GROUP BY 1 ORDER BY 1"}),
+    "sample_products": (2, "GET", "/sample/products?n=50", None),
+    "sample_state":   (1, "GET", "/sample/state?n=50", None),
+    "bm25_text":      (3, "POST", "/bm25", {"q": "tender procurement", "k": 8, "index": "text"}),
+    "bm25_all":       (2, "POST", "/bm25", {"q": "laptop warranty", "k": 8, "index": "all"}),
+    # titles are file stems; bench.gen names the text corpus doc_000000.txt, doc_000001.txt, ...
+    "bm25_suggest":   (2, "POST", "/bm25/suggest", {"q": "doc_00", "k": 8, "index": "text"}),
+    "json_get_key":   (2, "POST", "/json/get", {"name": "ministry_hierarchy", "key": "tree.0.ministry"}),
+    "json_get_doc":   (1, "POST", "/json/get", {"name": "product_categories_metadata"}),
+    "excel":          (1, "POST", "/excel", {"sheet": "Sheet1"}),
+}
+
+def percentile(sorted_vals, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_vals:
+        return None
+    k = max(0, min(len(sorted_vals), math.ceil(p / 100 * len(sorted_vals))) - 1)
+    return sorted_vals[k]
+
+def summarize(samples, seconds):
+    """samples: [(latency_s, ok)] -> counts, rps and latency percentiles in ms."""
+    lat = sorted(s[0] * 1000 for s in samples)
+    errors = sum(1 for s in samples if not s[1])
+    return {"requests": len(samples), "errors": errors, "rps": round(len(samples) / seconds, 2) if seconds else None,
+            "mean_ms": round(sum(lat) / len(lat), 3) if lat else None,
+            **{f"p{p}_ms": (round(percentile(lat, p), 3) if lat else None) for p in (50, 95, 99)},
+            "max_ms": round(lat[-1], 3) if lat else None}
+
+def _in_process_client(data_dir, no_cache):
+    meta = json.load(open(os.path.join(data_dir, "bench_env.json"), encoding="utf-8"))
+    os.environ.update(meta["env"])
+    os.environ.setdefault("REFRESH_SECS", "0")      # no background refresh competing with the clients
+    if no_cache:
+        os.environ["RESULT_CACHE_MB"] = "0"
+    sys.path.insert(0, ROOT)
+    import app
+    from fastapi.testclient import TestClient
+    return TestClient(app.app), meta
+
+def _ok(r):
+    if r.status_code != 200:
+        return False
+    if r.headers.get("content-type", "").startswith("application/json"):
+        body = r.json()
+        return not isinstance(body, dict) or body.get("ok", True)
+    return True
+
+def _worker(client, names, weights, deadline, warm_until, seed, out, lock):
+    rng = random.Random(seed)
+    mine = {}
+    while True:
+        now = time.perf_counter()
+        if now >= deadline:
+            break
+        name = rng.choices(names, weights)[0]
+        _, method, path, body = SCENARIOS[name]
+        t0 = time.perf_counter()
+        try:
+            r = client.request(method, path, json=body)
+            ok = _ok(r)
+        except Exception:
+            ok = False
+        t1 = time.perf_counter()
+        if t0 >= warm_until:
+            mine.setdefault(name, []).append((t1 - t0, ok))
+    with lock:
+        for name, s in mine.items():
+            out.setdefault(name, []).extend(s)
+
+def run(client, clients, seconds, warmup, only, seed):
+    names = [n for n in SCENARIOS if not only or n in only]
+    weights = [SCENARIOS[n][0] for n in names]
+    # every scenario once up front: fails fast on a broken setup and fills lazy caches fairly
+    for n in names:
+        _, method, path, body = SCENARIOS[n]
+        r = client.request(method, path, json=body)
+        if not _ok(r):
+            print(f"[bench] warning: {n} failed: {r.status_code} {r.text[:200]}")
+    out, lock = {}, threading.Lock()
+    start = time.perf_counter()
+    warm_until, deadline = start + warmup, start + warmup + seconds
+    threads = [threading.Thread(target=_worker, args=(client, names, weights, deadline, warm_until, seed + i, out, lock))
+               for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    result = {"scenarios": {n: summarize(out.get(n, []), seconds) for n in names}}
+    result["overall"] = summarize([s for v in out.values() for s in v], seconds)
+    return result
+
+def compare(new, old, tolerance):
+    """Per-scenario deltas (percent, positive = slower/fewer) and the list of p95 regressions."""
+    def pct(a, b):
+        return round((a - b) / b * 100, 1) if a is not None and b else None
+    rows, regressions = {}, []
+    for name, cur in {**new["scenarios"], "overall": new["overall"]}.items():
+        base = old["overall"] if name == "overall" else old.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        d = {k: pct(cur[k], base[k]) for k in ("p50_ms", "p95_ms", "p99_ms")}
+        rps = pct(cur["rps"], base["rps"])
+        d["rps"] = -rps if rps is not None else None
+        rows[name] = d
+        if d["p95_ms"] is not None and d["p95_ms"] > tolerance:
+            regressions.append(name)
+    return {"baseline": old.get("meta"), "delta_pct": rows, "tolerance_pct": tolerance, "regressions": regressions}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Load-test data-exec endpoints")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--data", help="bench.gen output dir; runs the app in-process")
+    src.add_argument("--url", help="base URL of a running server")
+    ap.add_argument("--clients", type=int, default=8)
+    ap.add_argument("--seconds", type=float, default=20)
+    ap.add_argument("--warmup", type=float, default=3, help="seconds of load not counted")
+    ap.add_argument("--only", nargs="*", choices=list(SCENARIOS), help="subset of scenarios")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--no-cache", action="store_true", help="in-process only: RESULT_CACHE_MB=0")
+    ap.add_argument("--out", help="write the JSON report here (default: stdout only)")
+    ap.add_argument("--compare", help="earlier report to diff against")
+    ap.add_argument("--tolerance", type=float, default=10.0, help="allowed p95 regression, percent")
+    args = ap.parse_args(argv)
+
+    meta = {"ts": dt.datetime.utcnow().isoformat(), "clients": args.clients, "seconds": args.seconds,
+            "warmup": args.warmup, "seed": args.seed, "python": platform.python_version(),
+            "machine": platform.machine(), "cpus": os.cpu_count()}
+    if args.url:
+        import httpx
+        client = httpx.Client(base_url=args.url, timeout=300,
+                              limits=httpx.Limits(max_connections=args.clients * 2))
+        ctx, meta["target"] = client, args.url
+    else:
+        client, data_meta = _in_process_client(args.data, args.no_cache)
+        ctx = client  # entering runs the app's startup (view warm-up)
+        meta.update(target="in-process", data=args.data, scale=data_meta.get("scale"),
+                    rows=data_meta.get("rows"), result_cache=not args.no_cache)
+    with ctx:
+        report = {"meta": meta, **run(client, args.clients, args.seconds, args.warmup, args.only, args.seed)}
+    code = 0
+    if args.compare:
+        report["compare"] = compare(report, json.load(open(args.compare, encoding="utf-8")), args.tolerance)
+        code = 1 if report["compare"]["regressions"] else 0
+    text = json.dumps(report, indent=1)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    return code
+
+if __name__ == "__main__":
+    sys.exit(main())
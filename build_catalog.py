@@ -0,0 +1,84 @@
+# build_catalog.py
+"""Mount every source once and persist the result into CATALOG_DB, a DuckDB file that
+`USE_CATALOG=1` workers attach read-only instead of mounting everything themselves:
+
+    python build_catalog.py
+    USE_CATALOG=1 uvicorn app:app --workers 4 --host 0.0.0.0 --port 8008
+
+Views (services, products, contracts_all, ...) are stored as views, so they still read the
+source files at query time; tables (JSON metadata, products snapshot, rollup cube) and the
+Excel sheets are stored with their data. The file is written next to CATALOG_DB and renamed
+over it; workers keep the catalog they attached until restarted (/ready shows "stale").
+"""
+import os, json, time, datetime as dt
+import duckdb
+
+os.environ["USE_CATALOG"] = "0"          # build from the sources, never from an older catalog
+os.environ["LAZY_MOUNT"] = "0"           # mount during import
+os.environ["REFRESH_SECS"] = "0"         # no refresher thread in a one-shot build
+import app
+
+def _catalog_objects(con):
+    tables = [r[0] for r in con.execute("""
+        SELECT table_name FROM duckdb_tables()
+        WHERE database_name = 'memory' AND schema_name = 'main' AND NOT temporary""").fetchall()]
+    views = con.execute("""
+        SELECT view_name, sql FROM duckdb_views()
+        WHERE database_name = 'memory' AND schema_name = 'main' AND NOT internal AND NOT temporary""").fetchall()
+    return tables, views
+
+def write_catalog(path: str) -> dict:
+    tmp = path + ".tmp"
+    for p in (tmp, tmp + ".wal"):
+        if os.path.exists(p):
+            os.remove(p)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    con = app.DUCK
+    tables, views = _catalog_objects(con)
+    # excel_* views read the Parquet cache; copy them so workers need only the catalog
+    tables += [v for v, _ in views if v.startswith("excel_")]
+    views = [(v, sql) for v, sql in views if not v.startswith("excel_")]
+    con.execute(f"ATTACH '{app._norm_path(tmp)}' AS catalog;")
+    con.execute("USE catalog;")  # unqualified names in the view bodies now resolve inside the catalog
+    try:
+        for t in tables:
+            con.execute(f'CREATE TABLE "{t}" AS SELECT * FROM memory.main."{t}";')
+        # views depend on each other; create whatever binds until nothing is left
+        pending = dict(views)
+        while pending:
+            failed = {}
+            for v, sql in pending.items():
+                try:
+                    con.execute(sql)
+                except (duckdb.CatalogException, duckdb.BinderException) as e:
+                    failed[v] = (sql, e)
+            if len(failed) == len(pending):
+                raise RuntimeError(f"views that do not bind: { {v: str(e) for v, (_, e) in failed.items()} }")
+            pending = {v: sql for v, (sql, _) in failed.items()}
+        meta = {"built_at": dt.datetime.utcnow().isoformat(),
+                "sources_sig": json.dumps(app._sources_sig()),
+                "products_mode": app.PRODUCTS_MATERIALIZE or "live",
+                "rollups_built_at": app.ROLLUPS_CUBE.built_at or ""}
+        con.execute("CREATE TABLE _catalog_meta (key VARCHAR, value VARCHAR);")
+        con.executemany("INSERT INTO _catalog_meta VALUES (?, ?)", list(meta.items()))
+    finally:
+        con.execute("USE memory;")
+        con.execute("DETACH catalog;")
+    try:
+        os.replace(tmp, path)
+    except PermissionError:
+        # Windows will not replace a file that running workers hold open
+        raise RuntimeError(f"{path} is in use; stop the workers, then move {tmp} over it") from None
+    return {"path": path, "tables": len(tables), "views": len(views), **meta}
+
+if __name__ == "__main__":
+    t0 = time.perf_counter()
+    if app.MOUNT_ERRORS:
+        print(f"[catalog] warning: some mounts failed {app.MOUNT_ERRORS}")
+    app.PRODUCTS_SNAPSHOT.refresh()
+    if app.ROLLUPS:
+        app.ROLLUPS_CUBE.refresh()
+    if app.CONTRACT_FTS:
+        app.CONTRACT_INDEX.refresh()  # the workers only read it
+    out = write_catalog(app.CATALOG_DB)
+    print(f"[catalog] wrote {out} in {time.perf_counter() - t0:.1f}s")
@@ -0,0 +1,26 @@
+# export_partitions.py
+"""Export the contract views to Hive-partitioned Parquet (PARTITION_DIR/<view>/year=/month=) and
+refresh it incrementally: only months whose rows changed are rewritten.
+
+    python export_partitions.py                 # all of products, services, ministry, state
+    python export_partitions.py services --full # rewrite every month of one view
+
+A running server picks the files up as <view>_pq at its next start (or call
+/admin/partitions/refresh on it instead of running this script).
+"""
+import os, sys, argparse
+
+os.environ["USE_CATALOG"] = "0"
+os.environ["LAZY_MOUNT"] = "0"
+os.environ["REFRESH_SECS"] = "0"
+import app
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("views", nargs="*", help=f"subset of {list(app.PARTITION_VIEWS)}")
+    ap.add_argument("--full", action="store_true", help="rewrite every partition")
+    args = ap.parse_args()
+    try:
+        print(app.PARTITIONS.refresh(args.views or None, full=args.full))
+    except ValueError as e:
+        sys.exit(str(e))
@@ -1,23 +1,109 @@
 # index_builder.py
-import os, sqlite3, pathlib
-from pptx import Presentation  # pip install python-pptx
+import os, io, sqlite3, pathlib, hashlib, time, zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-def ensure_schema(dbfile):
+INDEX_WORKERS = int(os.getenv("INDEX_WORKERS", str(os.cpu_count() or 2)))
+BATCH_DOCS    = int(os.getenv("INDEX_BATCH_DOCS", "500"))   # docs per write transaction
+TITLE_WEIGHT  = float(os.getenv("BM25_TITLE_WEIGHT", "4.0"))  # bm25 weight of a title hit vs. a body hit
+
+# "plain" keeps docs.body as text behind an external-content FTS; "compact" zlib-compresses docs.body
+# and keeps a contentless FTS (same postings and bm25 ranking; the app builds snippets itself).
+# Unset keeps each file's mode (new files are plain); set, existing files are converted on next sync
+INDEX_STORAGE = os.getenv("INDEX_STORAGE", "").lower()
+
+# title and body are both ranked; prefix= keeps 'lapt*' (type-ahead) off the full term scan
+DOCS_FTS = "fts5(title, body, content='docs', content_rowid='id', prefix='2 3 4')"
+# detail=full: detail=column drops in-column term frequencies, and bm25() then scores every hit 0
+DOCS_FTS_COMPACT = "fts5(title, body, content='', prefix='2 3 4')"
+
+def pack_body(text, storage):
+    return zlib.compress(text.encode("utf-8"), 6) if storage == "compact" else text
+
+def unpack_body(body):
+    # compact files hold BLOBs, plain ones TEXT; readers need not know which
+    return zlib.decompress(body).decode("utf-8") if isinstance(body, bytes) else body
+
+def ensure_schema(dbfile, storage=None):
+    """Create or migrate dbfile; converts its docs/FTS storage to `storage` (default INDEX_STORAGE)."""
+    storage = storage or INDEX_STORAGE
+    if storage not in ("", "plain", "compact"):
+        raise ValueError(f"INDEX_STORAGE must be plain or compact, not {storage!r}")
     con = sqlite3.connect(dbfile)
     c = con.cursor()
     c.execute("CREATE TABLE IF NOT EXISTS docs (id INTEGER PRIMARY KEY, path TEXT, title TEXT, body TEXT)")
-    c.execute("CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(body, content='docs', content_rowid='id')")
+    c.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    c.execute("CREATE INDEX IF NOT EXISTS docs_path ON docs(path)")
+    # one row per source file seen, so reruns only touch what changed
+    c.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, sha1 TEXT)")
+    if c.execute("PRAGMA user_version").fetchone()[0] < 1:
+        # indexes built before files were tracked: adopt their docs (no hash, so each is re-checked once)
+        c.execute("INSERT OR IGNORE INTO files(path) SELECT DISTINCT path FROM docs")
+        c.execute("PRAGMA user_version=1")
+    if c.execute("PRAGMA user_version").fetchone()[0] < 2:
+        # body-only FTS from older builds: recreate with title + prefix indexes, re-read from docs
+        c.execute("DROP TABLE IF EXISTS docs_fts")
+        c.execute(f"CREATE VIRTUAL TABLE docs_fts USING {DOCS_FTS}")
+        c.execute("INSERT INTO docs_fts(docs_fts) VALUES ('rebuild')")
+        c.execute("PRAGMA user_version=2")
+    if c.execute("PRAGMA user_version").fetchone()[0] < 3:
+        # compact files first built their FTS with detail=column (unranked): rebuild at detail=full
+        fts = c.execute("SELECT sql FROM sqlite_master WHERE name='docs_fts'").fetchone()
+        if fts and "detail=column" in fts[0]:
+            _convert_storage(con, "compact")
+        c.execute("PRAGMA user_version=3")
+    if storage and get_storage(con) != storage:
+        _convert_storage(con, storage)
+    # stored in the index, so readers' ORDER BY rank weighs titles without knowing the weight
+    c.execute("INSERT INTO docs_fts(docs_fts, rank) VALUES ('rank', ?)", (f"bm25({TITLE_WEIGHT:g}, 1.0)",))
     con.commit(); con.close()
 
+def get_storage(con):
+    if not con.execute("SELECT 1 FROM sqlite_master WHERE name='meta'").fetchone():
+        return "plain"  # built before storage modes existed
+    row = con.execute("SELECT value FROM meta WHERE key='storage'").fetchone()
+    return row[0] if row else "plain"
+
+def _convert_storage(con, storage):
+    # one doc at a time, so converting a large index never holds the corpus in memory
+    con.execute("DROP TABLE IF EXISTS docs_fts")
+    con.execute(f"CREATE VIRTUAL TABLE docs_fts USING {DOCS_FTS_COMPACT if storage == 'compact' else DOCS_FTS}")
+    for (rowid,) in con.execute("SELECT id FROM docs").fetchall():
+        title, body = con.execute("SELECT title, body FROM docs WHERE id=?", (rowid,)).fetchone()
+        text = unpack_body(body) or ""
+        con.execute("UPDATE docs SET body=? WHERE id=?", (pack_body(text, storage), rowid))
+        if storage == "compact":
+            con.execute("INSERT INTO docs_fts(rowid, title, body) VALUES (?,?,?)", (rowid, title, text))
+    if storage != "compact":
+        con.execute("INSERT INTO docs_fts(docs_fts) VALUES ('rebuild')")
+    con.execute("INSERT OR REPLACE INTO meta VALUES ('storage', ?)", (storage,))
+
+def _bulk_connect(dbfile):
+    con = sqlite3.connect(dbfile)
+    con.execute("PRAGMA journal_mode=WAL")   # the app can keep searching while we write
+    con.execute("PRAGMA synchronous=OFF")
+    con.execute("PRAGMA temp_store=MEMORY")
+    con.execute("PRAGMA cache_size=-131072")  # 128 MiB
+    return con
+
+def _insert_doc(con, path, title, body, storage="plain"):
+    rowid = con.execute("INSERT INTO docs(path,title,body) VALUES (?,?,?)",
+                        (path, title, pack_body(body, storage))).lastrowid
+    con.execute("INSERT INTO docs_fts(rowid, title, body) VALUES (?,?,?)", (rowid, title, body))
+
+def _delete_docs(con, path):
+    # external-content and contentless FTS5 both need the old text to remove its postings
+    for rowid, title, body in con.execute("SELECT id, title, body FROM docs WHERE path=?", (path,)).fetchall():
+        con.execute("INSERT INTO docs_fts(docs_fts, rowid, title, body) VALUES ('delete', ?, ?, ?)",
+                    (rowid, title, unpack_body(body)))
+    con.execute("DELETE FROM docs WHERE path=?", (path,))
+
 def add_doc(dbfile, path, title, body):
     con = sqlite3.connect(dbfile)
-    c = con.cursor()
-    c.execute("INSERT INTO docs(path,title,body) VALUES (?,?,?)", (path, title, body))
-    rowid = c.lastrowid
-    c.execute("INSERT INTO docs_fts(rowid, body) VALUES (?,?)", (rowid, body))
+    _insert_doc(con, path, title, body, get_storage(con))
     con.commit(); con.close()
 
 def extract_text_from_pptx(pth):
+    from pptx import Presentation  # pip install python-pptx
     prs = Presentation(pth)
     txt = []
     for slide in prs.slides:
@@ -26,19 +112,178 @@ def extract_text_from_pptx(pth):
                 txt.append(shape.text)
     return "\n".join(txt)
 
-def walk_and_index(dbfile, root, kind="text"):
+def _wanted(p, kind):
+    suffix = p.suffix.lower()
+    if kind == "ppt":
+        return suffix == ".pptx"
+    return kind in ("text", "media") and suffix in (".txt", ".vtt")
+
+def _extract(job):
+    """Worker: (path, kind, known sha1, mtime_ns, size) -> (path, title, text, sha1, mtime_ns, size, error).
+    text is None when the content hash matches what is already indexed."""
+    path, kind, old_sha, mtime_ns, size = job
+    p = pathlib.Path(path)
+    try:
+        data = p.read_bytes()
+        sha = hashlib.sha1(data).hexdigest()
+        if sha == old_sha:
+            return path, p.stem, None, sha, mtime_ns, size, None
+        if kind == "ppt":
+            text = extract_text_from_pptx(io.BytesIO(data))
+        else:
+            text = data.decode("utf-8", errors="ignore")
+        return path, p.stem, text, sha, mtime_ns, size, None
+    except Exception as e:
+        return path, p.stem, None, None, mtime_ns, size, str(e)
+
+def _write_batch(con, results, known, stats, storage):
+    with con:
+        for path, title, text, sha, mtime_ns, size, err in results:
+            if err:
+                print("skip", path, err)
+                stats["skipped"] += 1
+                continue
+            if text is not None:
+                _delete_docs(con, path)
+                if text.strip():
+                    _insert_doc(con, path, title, text, storage)
+                stats["updated" if path in known else "added"] += 1
+            else:
+                stats["unchanged"] += 1
+            con.execute("INSERT OR REPLACE INTO files(path, mtime_ns, size, sha1) VALUES (?,?,?,?)",
+                        (path, mtime_ns, size, sha))
+
+def walk_and_index(dbfile, root, kind="text", workers=INDEX_WORKERS):
+    """Incrementally sync dbfile with the files under root: new files are added, changed ones
+    (mtime/size, then sha1) re-indexed and vanished ones deleted. Returns the counts."""
     ensure_schema(dbfile)
+    con = _bulk_connect(dbfile)
+    storage = get_storage(con)
+    known = {r[0]: r[1:] for r in con.execute("SELECT path, mtime_ns, size, sha1 FROM files")}
+    stats = {"added": 0, "updated": 0, "deleted": 0, "unchanged": 0, "skipped": 0}
+    seen, jobs = set(), []
     for dirpath, _, filenames in os.walk(root):
         for f in filenames:
             p = pathlib.Path(dirpath, f)
-            text, title = "", p.stem
+            if not _wanted(p, kind):
+                continue
+            path = str(p)
+            seen.add(path)
             try:
-                if kind=="ppt" and p.suffix.lower()==".pptx":
-                    text = extract_text_from_pptx(p)
-                elif kind in ("text","media"):
-                    if p.suffix.lower() in [".txt",".vtt"]:
-                        text = p.read_text(encoding="utf-8", errors="ignore")
-                if text.strip():
-                    add_doc(dbfile, str(p), title, text)
-            except Exception as e:
+                st = p.stat()
+            except OSError as e:
                 print("skip", p, e)
+                continue
+            mtime_ns, size, sha = known.get(path, (None, None, None))
+            if (mtime_ns, size) == (st.st_mtime_ns, st.st_size):
+                stats["unchanged"] += 1
+            else:
+                jobs.append((path, kind, sha, st.st_mtime_ns, st.st_size))
+    with con:
+        for path in known.keys() - seen:
+            _delete_docs(con, path)
+            con.execute("DELETE FROM files WHERE path=?", (path,))
+            stats["deleted"] += 1
+    # .pptx parsing is CPU-bound (processes); plain text is I/O-bound (threads)
+    pool_cls = ProcessPoolExecutor if kind == "ppt" else ThreadPoolExecutor
+    with pool_cls(max_workers=max(1, workers)) as ex:
+        # one window of jobs at a time keeps at most BATCH_DOCS extracted texts in memory
+        for i in range(0, len(jobs), BATCH_DOCS):
+            _write_batch(con, list(ex.map(_extract, jobs[i:i + BATCH_DOCS], chunksize=8)), known, stats, storage)
+    # fold the WAL back so the file is self-contained for read-only/immutable readers
+    con.execute("PRAGMA journal_mode=DELETE")
+    con.close()
+    return stats
+
+def _sample_terms(con, n):
+    # the most common indexed terms: the slowest single-term queries the index has to answer
+    con.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.docs_vocab USING fts5vocab(main, 'docs_fts', 'row')")
+    return [r[0] for r in con.execute("SELECT term FROM temp.docs_vocab ORDER BY doc DESC LIMIT ?", (n,))]
+
+def measure(dbfile, terms, rounds=3):
+    """File size, FTS data pages and ranked top-8 latency (ms) over `terms`, on a fresh connection;
+    "top" is each term's top 8 as (rowid, score), for comparing rankings across a conversion."""
+    con = sqlite3.connect(f"file:{pathlib.Path(dbfile).resolve().as_posix()}?mode=ro", uri=True)
+    try:
+        lat, top = [], {}
+        for _ in range(rounds):
+            for t in terms:
+                t0 = time.perf_counter()
+                rows = con.execute("SELECT rowid, -rank FROM docs_fts WHERE docs_fts MATCH ? ORDER BY rank LIMIT 8",
+                                   ('"' + t.replace('"', '""') + '"',)).fetchall()
+                lat.append((time.perf_counter() - t0) * 1000)
+                top[t] = [(r[0], round(r[1], 6)) for r in rows]
+        lat.sort()
+        pages = con.execute("SELECT count(*) FROM docs_fts_data").fetchone()[0]
+    finally:
+        con.close()
+    pick = lambda p: round(lat[min(len(lat) - 1, int(p / 100 * len(lat)))], 3) if lat else None
+    return {"bytes": os.path.getsize(dbfile), "fts_pages": pages, "p50_ms": pick(50), "p95_ms": pick(95), "top": top}
+
+def _same_ranking(was, now, tol=1e-6):
+    # ties come back in any order, and docs tied at the cut-off may trade places with docs past it:
+    # the scores must match position by position, the docs only above the last score
+    if len(was) != len(now) or any(abs(a - b) > tol * max(1.0, abs(a)) for (_, a), (_, b) in zip(was, now)):
+        return False
+    cut = was[-1][1] if was else 0.0
+    above = lambda top: {rowid for rowid, s in top if s - cut > tol * max(1.0, abs(cut))}
+    return above(was) == above(now)
+
+def maintain(dbfile, storage=None, merge=0, sample=50):
+    """Convert to `storage` if given (else INDEX_STORAGE, else keep the file's), fold FTS segments (full 'optimize', or `merge` pages of
+    incremental merging) and VACUUM, all on a copy that replaces dbfile only once its ranking checks out (needs room for
+    the copy); returns size/latency before and after."""
+    con = sqlite3.connect(dbfile)
+    try:
+        terms = _sample_terms(con, sample)
+    finally:
+        con.close()
+    before = measure(dbfile, terms)
+    t0 = time.perf_counter()
+    tmp = dbfile + ".maint"
+    for p in (tmp, tmp + "-wal", tmp + "-shm"):
+        if os.path.exists(p):
+            os.remove(p)
+    try:
+        src, dst = sqlite3.connect(dbfile), sqlite3.connect(tmp)
+        try:
+            src.backup(dst)  # a consistent copy, WAL frames included
+        finally:
+            src.close(); dst.close()
+        ensure_schema(tmp, storage)
+        con = sqlite3.connect(tmp)
+        try:
+            storage = get_storage(con)
+            with con:
+                if merge:
+                    con.execute("INSERT INTO docs_fts(docs_fts, rank) VALUES ('merge', ?)", (int(merge),))
+                else:
+                    con.execute("INSERT INTO docs_fts(docs_fts) VALUES ('optimize')")
+            con.execute("VACUUM")
+            con.execute("PRAGMA optimize")
+            con.execute("PRAGMA journal_mode=DELETE")  # a single file to move; writers switch back to WAL
+        finally:
+            con.close()
+        after = measure(tmp, terms)
+        # neither a storage conversion nor segment merging may change what a query ranks first
+        # (terms that scored all 0 before come from an old detail=column file this run just fixed)
+        was, now = before.pop("top"), after.pop("top")
+        changed = [t for t in terms if any(s for _, s in was[t]) and not _same_ranking(was[t], now[t])]
+        if changed:
+            raise RuntimeError(f"{dbfile}: ranking changed for {len(changed)} of {len(terms)} sampled terms, e.g. {changed[:3]}; "
+                               "the file was left as it was")
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    con = sqlite3.connect(dbfile)
+    try:
+        con.execute("PRAGMA wal_checkpoint(TRUNCATE)")  # no old WAL frames left to replay onto the new file
+    finally:
+        con.close()
+    try:
+        os.replace(tmp, dbfile)
+    except PermissionError:
+        # Windows will not replace a file that a running app holds open
+        raise RuntimeError(f"{dbfile} is in use; stop the app, then move {tmp} over it") from None
+    return {"storage": storage, "secs": round(time.perf_counter() - t0, 2), "before": before, "after": after}
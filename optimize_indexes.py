@@ -0,0 +1,37 @@
+# optimize_indexes.py
+"""Fold the BM25 indexes' FTS segments and VACUUM them, printing file size and query latency
+before and after (JSON per index):
+
+    python optimize_indexes.py                      # FTS optimize + VACUUM every startup.py index
+    python optimize_indexes.py --merge 500          # bounded incremental merge instead of a full optimize
+    python optimize_indexes.py --storage compact    # also convert to compressed bodies + contentless FTS
+
+Each index is converted and optimized as a copy next to it (room for one copy needed), which is
+moved over the original only if the sampled terms' top-8 ranking matches (scores, docs up to ties);
+otherwise it fails and leaves the file alone. Run it while nothing is writing the index; the app keeps
+serving (its pools reopen on the new file).
+A converted file keeps its mode on later startup.py syncs unless INDEX_STORAGE says otherwise.
+"""
+import os, json, argparse
+from index_builder import maintain
+from startup import targets
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Optimize BM25 index files")
+    ap.add_argument("db", nargs="*", help="index files (default: the startup.py targets)")
+    ap.add_argument("--storage", choices=["plain", "compact"], help="convert to this storage mode")
+    ap.add_argument("--merge", type=int, default=0, help="pages of incremental FTS merge instead of 'optimize'")
+    ap.add_argument("--sample", type=int, default=50, help="most frequent terms timed before and after")
+    args = ap.parse_args(argv)
+    for db in args.db or [t[0] for t in targets]:
+        if not os.path.exists(db):
+            print(f"[optimize] {db}: not found, skipped")
+            continue
+        out = maintain(db, storage=args.storage, merge=args.merge, sample=args.sample)
+        b, a = out["before"], out["after"]
+        print(f"[optimize] {db}: {b['bytes'] / 1e6:.1f} -> {a['bytes'] / 1e6:.1f} MB, "
+              f"p50 {b['p50_ms']} -> {a['p50_ms']} ms ({out['storage']}, {out['secs']}s)")
+        print(json.dumps({"db": db, **out}))
+
+if __name__ == "__main__":
+    main()
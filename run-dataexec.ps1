@@ -13,7 +13,8 @@ $req = @(
   "pandas==2.2.2",
   "openpyxl==3.1.5",
   "python-multipart==0.0.9",
-  "python-pptx==0.6.23"
+  "python-pptx==0.6.23",
+  "pyarrow==16.1.0"
 )
 pip install $req -q
 
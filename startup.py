@@ -1,9 +1,7 @@
 # startup.py
-import os, pathlib
+import os, sys, json, pathlib, time
 from index_builder import walk_and_index
 
-os.makedirs("indices", exist_ok=True)
-
 TEXT_ROOT  = os.getenv("TEXT_ROOT",  "E:/data_growth_agent/texts")
 PPT_ROOT   = os.getenv("PPT_ROOT",   "E:/data_growth_agent/ppt")
 MEDIA_ROOT = os.getenv("MEDIA_ROOT", "E:/data_growth_agent/media_txt")
@@ -14,10 +12,34 @@ targets = [
     ("indices/media_bm25.sqlite", MEDIA_ROOT, "media"),
 ]
 
-for dbfile, root, kind in targets:
-    if not os.path.exists(dbfile):
-        pathlib.Path(root).mkdir(parents=True, exist_ok=True)
-        print(f"[startup] Building {dbfile} from {root} ({kind})")
-        walk_and_index(dbfile, root, kind=kind)
-    else:
-        print(f"[startup] Found existing {dbfile}")
+# The Procfile runs this next to the web process, so the outcome is written here for /ready to report
+SYNC_STATUS = os.getenv("INDEX_SYNC_STATUS", "indices/sync_status.json")
+
+def write_status(status):
+    tmp = SYNC_STATUS + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(status, f)
+    os.replace(tmp, SYNC_STATUS)
+
+# guarded: the .pptx extractor's worker processes re-import this module on spawn
+if __name__ == "__main__":
+    os.makedirs("indices", exist_ok=True)
+    os.makedirs(os.path.dirname(SYNC_STATUS) or ".", exist_ok=True)
+    status = {"state": "running", "started": time.time(), "indexes": {}, "errors": {}}
+    write_status(status)
+    for dbfile, root, kind in targets:
+        print(f"[startup] Syncing {dbfile} from {root} ({kind})")
+        t0 = time.perf_counter()
+        try:
+            pathlib.Path(root).mkdir(parents=True, exist_ok=True)
+            stats = walk_and_index(dbfile, root, kind=kind)
+        except Exception as e:  # keep syncing the others; the failure is reported, not swallowed
+            status["errors"][dbfile] = f"{type(e).__name__}: {e}"
+            print(f"[startup] {dbfile} FAILED: {e}", file=sys.stderr)
+        else:
+            status["indexes"][dbfile] = {**stats, "secs": round(time.perf_counter() - t0, 1)}
+            print(f"[startup] {dbfile}: {stats} in {time.perf_counter() - t0:.1f}s")
+        write_status(status)
+    status.update(state="failed" if status["errors"] else "done", finished=time.time())
+    write_status(status)
+    sys.exit(1 if status["errors"] else 0)